@@ -3,3 +3,6 @@ from django.contrib import admin
 from assets import models
 
 admin.site.register(models.Permissions)
+admin.site.register(models.StorageUsage)
+admin.site.register(models.FileExtensionStats)
+admin.site.register(models.ReportRun)
@@ -7,3 +7,7 @@ class AssetsConfig(AppConfig):
     """Assets app."""
 
     name = 'assets'
+
+    def ready(self):
+        """Connect signal handlers."""
+        from assets import signals  # noqa: F401
@@ -1,10 +1,15 @@
 """Any API methods with AWS S3."""
+from collections import OrderedDict
 import logging
+import threading
+import time
+from xml.sax.saxutils import escape
 
 import boto3
 from botocore.config import Config
 from botocore.exceptions import ClientError
 from django.conf import settings
+from django.db import transaction
 from rest_framework.exceptions import ParseError
 
 from assets import models
@@ -12,35 +17,138 @@ from assets.db import queries
 
 logger = logging.getLogger(__name__)
 
+DELETE_OBJECTS_LIMIT = 1000
+
+_client = None
+_client_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_client_options():
+    """Return credentials and config of S3 clients."""
+    config = Config(signature_version=settings.AWS_SIGNATURE_VERSION,
+                    region_name=settings.AWS_REGION,
+                    max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS,
+                    connect_timeout=settings.AWS_S3_CONNECT_TIMEOUT,
+                    read_timeout=settings.AWS_S3_READ_TIMEOUT,
+                    retries={'max_attempts': settings.AWS_S3_MAX_ATTEMPTS,
+                             'mode': settings.AWS_S3_RETRY_MODE})
+    return {
+        'aws_access_key_id': settings.AWS_KEY,
+        'aws_secret_access_key': settings.AWS_SECRET_KEY,
+        'config': config,
+    }
+
+
+def get_client():
+    """Return S3 client shared by all threads.
+
+    Clients are thread-safe, so the process creates one under a lock and
+    all threads reuse its pool of connections.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = boto3.session.Session().client('s3', **get_client_options())
+    return _client
+
+
+def get_resource():
+    """Return S3 resource of the current thread.
+
+    Resources are not thread-safe, so each thread gets its own one. It sends
+    requests through the shared client instead of opening its own pool.
+    """
+    resource = getattr(_local, 'resource', None)
+    if resource is None:
+        resource = _local.resource = boto3.session.Session().resource('s3', **get_client_options())
+        resource.meta.client = get_client()
+    return resource
+
 
 def create_bucket():
     """Create instance of Bucket."""
-    credentials = {
-        'aws_access_key_id': settings.AWS_KEY,
-        'aws_secret_access_key': settings.AWS_SECRET_KEY
+    return get_resource().Bucket(name=settings.S3_BUCKET)
+
+
+class PresignedUrlCache:
+    """LRU cache of presigned URLs.
+
+    URL is kept only for a part of its lifetime, so a cached URL always
+    stays valid long enough to be used by a client.
+    """
+
+    def __init__(self, max_size, timeout):
+        """Set size limit and timeout in seconds for cached URLs."""
+        self.max_size = max_size
+        self.timeout = timeout
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return cached URL or None if it is missing or expired."""
+        with self._lock:
+            cached = self._urls.get(key)
+            if cached is None:
+                return None
+            url, expires_at = cached
+            if expires_at <= time.monotonic():
+                del self._urls[key]
+                return None
+            self._urls.move_to_end(key)
+            return url
+
+    def set(self, key, url):
+        """Cache URL and evict the least recently used one over the limit."""
+        with self._lock:
+            self._urls[key] = (url, time.monotonic() + self.timeout)
+            self._urls.move_to_end(key)
+            while len(self._urls) > self.max_size:
+                self._urls.popitem(last=False)
+
+    def clear(self):
+        """Remove all cached URLs."""
+        with self._lock:
+            self._urls.clear()
+
+
+url_cache = PresignedUrlCache(
+    max_size=settings.AWS_S3_PRESIGNED_URL_CACHE_SIZE,
+    timeout=settings.AWS_S3_PRESIGNED_URL_EXPIRES_IN * settings.AWS_S3_PRESIGNED_URL_CACHE_FRACTION
+)
+
+
+def get_presigned_url(key, disposition=None):
+    """Return presigned URL for download object signed with the shared client."""
+    cache_key = (key, disposition)
+    url = url_cache.get(cache_key)
+    if url is not None:
+        return url
+
+    params = {
+        'Bucket': settings.S3_BUCKET,
+        'Key': key
     }
-    config = Config(signature_version=settings.AWS_SIGNATURE_VERSION,
-                    region_name=settings.AWS_REGION)
+    if disposition is not None:
+        params['ResponseContentDisposition'] = disposition
 
-    return boto3.resource('s3', **credentials, config=config).Bucket(
-        name=settings.S3_BUCKET)
+    url = get_client().generate_presigned_url('get_object',
+                                              Params=params,
+                                              ExpiresIn=settings.AWS_S3_PRESIGNED_URL_EXPIRES_IN)
+    url_cache.set(cache_key, url)
+    return url
 
 
 def get_url(uuid):
     """Get url for download file."""
-    bucket = create_bucket()
+    return get_file_url(models.File.objects.filter(uuid=uuid).first())
 
-    file_obj = models.File.objects.filter(relative_key__contains=uuid).first()
-    file_key = file_obj.relative_key
-    params = {
-        'Bucket': bucket.name,
-        'Key': file_key,
-        'ResponseContentDisposition': f'attachment; filename = {file_obj.title}'
-    }
-    response = bucket.meta.client.generate_presigned_url('get_object',
-                                                         Params=params,
-                                                         ExpiresIn=3600)
-    return response
+
+def get_file_url(file_obj):
+    """Get url for download the loaded file."""
+    return get_presigned_url(file_obj.relative_key,
+                             disposition=f'attachment; filename = {file_obj.title}')
 
 
 def upload_file(file_name, key, extension, content_type):
@@ -60,10 +168,103 @@ def upload_file(file_name, key, extension, content_type):
         return True
 
 
+def create_presigned_post(key, extension, content_type, max_size):
+    """Return URL and form fields for direct upload of the file to S3."""
+    tagging = ('<Tagging><TagSet><Tag><Key>Extension</Key>'
+               f'<Value>{escape(extension)}</Value></Tag></TagSet></Tagging>')
+    fields = {
+        'Content-Type': content_type,
+        'tagging': tagging
+    }
+    conditions = [
+        {'Content-Type': content_type},
+        {'tagging': tagging},
+        ['content-length-range', 0, max_size]
+    ]
+    return get_client().generate_presigned_post(settings.S3_BUCKET,
+                                                key,
+                                                Fields=fields,
+                                                Conditions=conditions,
+                                                ExpiresIn=settings.AWS_S3_UPLOAD_EXPIRES_IN)
+
+
+def get_object_size(key):
+    """Return size of the uploaded object or None if it does not exist."""
+    try:
+        response = get_client().head_object(Bucket=settings.S3_BUCKET, Key=key)
+    except ClientError:
+        return None
+    return response['ContentLength']
+
+
+def create_multipart_upload(key, extension, content_type):
+    """Start multipart upload of the file and return its id."""
+    response = get_client().create_multipart_upload(Bucket=settings.S3_BUCKET,
+                                                    Key=key,
+                                                    ContentType=content_type,
+                                                    Tagging=f'Extension={extension}')
+    return response['UploadId']
+
+
+def get_upload_part_urls(key, upload_id, part_numbers):
+    """Return presigned URLs for upload of the parts."""
+    return {
+        part_number: get_client().generate_presigned_url('upload_part',
+                                                         Params={'Bucket': settings.S3_BUCKET,
+                                                                 'Key': key,
+                                                                 'UploadId': upload_id,
+                                                                 'PartNumber': part_number},
+                                                         ExpiresIn=settings.AWS_S3_UPLOAD_EXPIRES_IN)
+        for part_number in part_numbers
+    }
+
+
+def list_parts(key, upload_id):
+    """Return all uploaded parts of multipart upload."""
+    paginator = get_client().get_paginator('list_parts')
+    parts = []
+    for page in paginator.paginate(Bucket=settings.S3_BUCKET, Key=key, UploadId=upload_id):
+        parts.extend({'part_number': part['PartNumber'],
+                      'etag': part['ETag'],
+                      'size': part['Size']}
+                     for part in page.get('Parts', []))
+    return parts
+
+
+def complete_multipart_upload(key, upload_id, parts):
+    """Assemble the object from uploaded parts.
+
+    Return None on success, otherwise error code of S3, e.g. 'EntityTooSmall'.
+    """
+    try:
+        get_client().complete_multipart_upload(
+            Bucket=settings.S3_BUCKET,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': [{'PartNumber': part['part_number'], 'ETag': part['etag']}
+                                       for part in parts]}
+        )
+    except ClientError as error:
+        logger.error(f'Error while completing multipart upload. key = {key}. {str(error)}')
+        return error.response.get('Error', {}).get('Code', 'Unknown')
+    return None
+
+
+def abort_multipart_upload(key, upload_id):
+    """Abort multipart upload and remove uploaded parts."""
+    try:
+        get_client().abort_multipart_upload(Bucket=settings.S3_BUCKET, Key=key, UploadId=upload_id)
+    except ClientError as error:
+        logger.error(f'Error while aborting multipart upload. key = {key}. {str(error)}')
+        return False
+    else:
+        return True
+
+
 def delete_key(file_id):
     """Delete file from S3."""
     bucket = create_bucket()
-    file_obj = models.File.objects.filter(relative_key__contains=file_id).first()
+    file_obj = models.File.objects.filter(uuid=file_id).first()
     key = file_obj.relative_key
 
     delete_dict = {
@@ -79,22 +280,34 @@ def delete_key(file_id):
         return True
 
 
-def delete_recursive(folder_id):
-    """Find all children and delete them."""
-    folders = models.Folder.objects.filter(parent__uuid=folder_id).exists()
-    files = models.File.objects.filter(folder__uuid=folder_id)
+def delete_keys(keys):
+    """Delete objects from S3 in batches of DeleteObjects limit."""
+    if not keys:
+        return True
 
-    for file in files:
-        uuid = file.relative_key.split('/')[-1]
-        delete_key(uuid)
-        queries.delete_shared_table(uuid)
-        queries.delete_file(uuid)
+    bucket = create_bucket()
+    for start in range(0, len(keys), DELETE_OBJECTS_LIMIT):
+        delete_dict = {
+            'Objects': [{'Key': key} for key in keys[start:start + DELETE_OBJECTS_LIMIT]],
+            'Quiet': True
+        }
+        try:
+            response = bucket.delete_objects(Delete=delete_dict)
+        except ClientError as error:
+            logger.error(f'Error while deleting objects from S3. {str(error)}')
+            return False
+
+        for error in response.get('Errors', []):
+            logger.error(f'Cannot delete object from S3. key = {error["Key"]}. {error["Message"]}')
+    return True
 
-    if folders:
-        folders_qs = models.Folder.objects.filter(parent__uuid=folder_id)
-        for folder in folders_qs:
-            delete_recursive(folder.uuid)
-    models.Folder.objects.get(uuid=folder_id).delete()
+
+def delete_recursive(folder_id):
+    """Delete folder with all children from DB and S3."""
+    folder = models.Folder.objects.get(uuid=folder_id)
+    with transaction.atomic():
+        keys = queries.delete_folder_tree(folder.path)
+    return delete_keys(keys)
 
 
 def check_exists(key):
@@ -109,17 +322,9 @@ def check_exists(key):
 
 
 def get_thumbnails(files) -> list:
-    bucket = create_bucket()
-
+    """Add presigned URLs of thumbnails to files."""
     for file in files:
         if not file['is_folder'] and file['thumbnail_key'] is not None:
-            params = {
-                'Bucket': bucket.name,
-                'Key': file['thumbnail_key']
-            }
-            response = bucket.meta.client.generate_presigned_url('get_object',
-                                                                 Params=params,
-                                                                 ExpiresIn=3600)
-            file['thumbnail'] = response
+            file['thumbnail'] = get_presigned_url(file['thumbnail_key'])
 
     return files
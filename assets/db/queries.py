@@ -1,33 +1,54 @@
 """Queries and related objects."""
 
-from django.db import connection
+from django.core.cache import cache
+from django.db import connection, connections, router
 from django.utils import timezone
 
 from assets import models
 
 
-def get_assets_list(folder_id, user_pk):
-    """Raw SQL query for receiving assets of folder or a root page."""
+def get_assets_list(folder_id, user_pk, after=None, limit=None):
+    """Raw SQL query for receiving assets of folder or a root page.
+
+    Folders go first, then files, both ordered by title and id. The page
+    starts after the (is_folder, title, id) values of 'after' and has at
+    most 'limit' rows.
+    """
+    after_is_folder, after_title, after_id = after if after is not None else (None, None, None)
     query = """
-        SELECT id, title, folder_id AS parent_id, False AS is_folder, SPLIT_PART(relative_key, '/', 4) as uuid, thumbnail_key as thumbnail_key
-          FROM assets_file
-         WHERE (folder_id = (select id
-                   from assets_folder
-                   where uuid::text = %(folder_id)s)
-            OR (%(folder_id)s IS NULL and folder_id IS NULL))
-           AND owner_id = %(owner)s
-         UNION
-        SELECT id, title, parent_id AS parent_id, True AS is_folder, uuid::text as uuid, Null as thumbnail_key
-          FROM assets_folder
-         WHERE (parent_id = (select id
-                   from assets_folder
-                   where uuid::text = %(folder_id)s)
-            OR (%(folder_id)s IS NULL and parent_id IS NULL))
+        (SELECT id, title, folder_id AS parent_id, False AS is_folder, uuid, thumbnail_key as thumbnail_key,
+                size, Null AS file_count
+           FROM assets_file
+          WHERE (folder_id = (select id
+                    from assets_folder
+                    where uuid::text = %(folder_id)s)
+             OR (%(folder_id)s IS NULL and folder_id IS NULL))
+            AND owner_id = %(owner)s
+            AND is_uploaded
+            AND (%(after_is_folder)s IS NULL OR %(after_is_folder)s
+             OR (title, id) > (%(after_title)s, %(after_id)s))
+       ORDER BY title, id
+          LIMIT %(limit)s)
+      UNION ALL
+        (SELECT id, title, parent_id AS parent_id, True AS is_folder, uuid::text as uuid, Null as thumbnail_key,
+                total_size AS size, file_count
+           FROM assets_folder
+          WHERE (parent_id = (select id
+                    from assets_folder
+                    where uuid::text = %(folder_id)s)
+             OR (%(folder_id)s IS NULL and parent_id IS NULL))
             AND owner_id = %(owner)s
-      ORDER BY is_folder DESC"""
+            AND (%(after_is_folder)s IS NULL
+             OR (%(after_is_folder)s AND (title, id) > (%(after_title)s, %(after_id)s)))
+       ORDER BY title, id
+          LIMIT %(limit)s)
+      ORDER BY is_folder DESC, title, id
+      LIMIT %(limit)s"""
 
-    with connection.cursor() as cursor:
-        cursor.execute(query, {'folder_id': folder_id, 'owner': user_pk})
+    with connections[router.db_for_read(models.File)].cursor() as cursor:
+        cursor.execute(query, {'folder_id': folder_id, 'owner': user_pk, 'limit': limit,
+                               'after_is_folder': after_is_folder, 'after_title': after_title,
+                               'after_id': after_id})
         rows = dictfetchall(cursor)
         return rows
 
@@ -42,13 +63,208 @@ def dictfetchall(cursor):
 
 
 def delete_recursive(folder_id):
-    """Recursive deleting folders and files."""
-    folders = models.Folder.objects.filter(parent=folder_id)
-    models.File.objects.filter(folder=folder_id).delete()
-    if len(folders) > 0:
-        for folder in folders:
-            delete_recursive(folder.pk)
-    models.Folder.objects.filter(pk=folder_id).delete()
+    """Delete folder with all nested folders, files and shares."""
+    folder = models.Folder.objects.get(pk=folder_id)
+    return delete_folder_tree(folder.path)
+
+
+def delete_folder_tree(path):
+    """Delete folders by materialized path with their files and shares.
+
+    Aggregates of ancestors, storage usage and extension statistics of
+    owners are decreased and cached permissions of the shares are dropped.
+    Return S3 keys of deleted files and thumbnails.
+    """
+    if not path:
+        raise ValueError('Cannot delete folders tree with empty path.')
+
+    files_query = """
+        SELECT assets_file.id
+          FROM assets_file
+          JOIN assets_folder ON assets_folder.id = assets_file.folder_id
+         WHERE assets_folder.path LIKE %(path)s"""
+    delete_shares_query = f"""
+           DELETE FROM assets_sharedtable
+            WHERE file_id IN ({files_query})
+        RETURNING user_id, file_id"""
+    delete_files_query = f"""
+          WITH deleted AS (
+               DELETE FROM assets_file
+                WHERE id IN ({files_query})
+            RETURNING owner_id, size, extension, is_uploaded, relative_key, thumbnail_key
+          ), usage AS (
+               UPDATE assets_storageusage
+                  SET used_size = used_size - owner_files.size,
+                      file_count = file_count - owner_files.count
+                 FROM (SELECT owner_id, sum(size) AS size, count(*) AS count
+                         FROM deleted
+                     GROUP BY owner_id) AS owner_files
+                WHERE assets_storageusage.user_id = owner_files.owner_id
+          ), extensions AS (
+               UPDATE assets_fileextensionstats
+                  SET total_bytes = assets_fileextensionstats.total_bytes - extension_files.size,
+                      count = assets_fileextensionstats.count - extension_files.count
+                 FROM (SELECT owner_id, COALESCE(extension, '') AS extension, sum(size) AS size, count(*) AS count
+                         FROM deleted
+                        WHERE is_uploaded
+                     GROUP BY owner_id, COALESCE(extension, '')) AS extension_files
+                WHERE assets_fileextensionstats.owner_id = extension_files.owner_id
+                  AND assets_fileextensionstats.extension = extension_files.extension
+          )
+        SELECT relative_key, thumbnail_key
+          FROM deleted"""
+    delete_folders_query = """
+        DELETE FROM assets_folder
+         WHERE path LIKE %(path)s"""
+
+    decrease_stats_query = """
+        UPDATE assets_folder
+           SET total_size = assets_folder.total_size - root.total_size,
+               file_count = assets_folder.file_count - root.file_count
+          FROM assets_folder AS root
+         WHERE root.path = %(root_path)s
+           AND assets_folder.id = ANY(%(ancestor_ids)s)"""
+
+    params = {'path': f'{path}%', 'root_path': path,
+              'ancestor_ids': [int(pk) for pk in path.split('/')[:-2]]}
+    with connection.cursor() as cursor:
+        cursor.execute(decrease_stats_query, params)
+        cursor.execute(delete_shares_query, params)
+        shares = cursor.fetchall()
+        cursor.execute(delete_files_query, params)
+        keys = [key for row in cursor.fetchall() for key in row if key]
+        cursor.execute(delete_folders_query, params)
+    # Shares are deleted without signals, so their cached permissions are dropped here.
+    cache.delete_many([key for user_pk, file_pk in shares
+                       for key in models.SharedTable.get_cache_keys(user_pk, file_pk)])
+    return keys
+
+
+def update_folder_stats(folder_id, size, count):
+    """Add size and count of files to aggregates of the folder and its ancestors."""
+    if folder_id is None or not (size or count):
+        return
+
+    query = """
+        UPDATE assets_folder
+           SET total_size = total_size + %(size)s,
+               file_count = file_count + %(count)s
+         WHERE id = ANY(CAST((SELECT string_to_array(rtrim(path, '/'), '/')
+                                FROM assets_folder
+                               WHERE id = %(folder_id)s) AS bigint[]))"""
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, {'folder_id': folder_id, 'size': size, 'count': count})
+
+
+def reconcile_folder_stats():
+    """Recalculate aggregates of all folders from their files.
+
+    Return number of corrected folders.
+    """
+    query = """
+        WITH direct AS (
+            SELECT folder_id, sum(size) AS size, count(*) AS count
+              FROM assets_file
+             WHERE folder_id IS NOT NULL
+               AND is_uploaded
+          GROUP BY folder_id
+        ), totals AS (
+            SELECT ancestor_id::bigint AS id, sum(direct.size) AS size, sum(direct.count) AS count
+              FROM direct
+              JOIN assets_folder ON assets_folder.id = direct.folder_id,
+                   unnest(string_to_array(rtrim(assets_folder.path, '/'), '/')) AS ancestor_id
+          GROUP BY ancestor_id
+        )
+        UPDATE assets_folder
+           SET total_size = COALESCE(totals.size, 0),
+               file_count = COALESCE(totals.count, 0)
+          FROM assets_folder AS folder
+          LEFT JOIN totals ON totals.id = folder.id
+         WHERE assets_folder.id = folder.id
+           AND (assets_folder.total_size, assets_folder.file_count)
+               IS DISTINCT FROM (COALESCE(totals.size, 0), COALESCE(totals.count, 0))"""
+
+    with connection.cursor() as cursor:
+        cursor.execute(query)
+        return cursor.rowcount
+
+
+def search_assets(query, user_pk, path=None, after=None, limit=None):
+    """Raw SQL query for searching files and folders by title.
+
+    Titles are matched with trigram word similarity which uses GIN indexes
+    on titles. Rows are ordered by rank, then folders go first and by id.
+    The search is limited to the subtree of materialized 'path' if it is
+    given. The page starts after the (rank, is_folder, id) values of
+    'after' and has at most 'limit' rows. Each row has 'folder_path' with
+    titles of folders containing the asset.
+    """
+    after_rank, after_is_folder, after_id = after if after is not None else (None, None, None)
+    query_sql = """
+          WITH matches AS (
+                SELECT id, title, folder_id AS parent_id, False AS is_folder, uuid, size,
+                       CAST(word_similarity(%(query)s, title) AS double precision) AS rank
+                  FROM assets_file
+                 WHERE %(query)s <%% title
+                   AND owner_id = %(owner)s
+                   AND is_uploaded
+                   AND (%(path)s IS NULL OR folder_id IN (SELECT id
+                                                            FROM assets_folder
+                                                           WHERE owner_id = %(owner)s
+                                                             AND path LIKE %(path)s))
+             UNION ALL
+                SELECT id, title, parent_id AS parent_id, True AS is_folder, uuid::text AS uuid,
+                       total_size AS size, CAST(word_similarity(%(query)s, title) AS double precision) AS rank
+                  FROM assets_folder
+                 WHERE %(query)s <%% title
+                   AND owner_id = %(owner)s
+                   AND (%(path)s IS NULL OR path LIKE %(path)s)
+          ), page AS (
+                SELECT *
+                  FROM matches
+                 WHERE %(after_rank)s IS NULL
+                    OR rank < %(after_rank)s
+                    OR (rank = %(after_rank)s AND (is_folder < %(after_is_folder)s
+                        OR (is_folder = %(after_is_folder)s AND id > %(after_id)s)))
+              ORDER BY rank DESC, is_folder DESC, id
+                 LIMIT %(limit)s
+          )
+        SELECT page.*,
+               COALESCE((SELECT string_agg(ancestor.title, '/' ORDER BY length(ancestor.path))
+                           FROM assets_folder AS parent
+                           JOIN assets_folder AS ancestor
+                             ON ancestor.id = ANY(CAST(string_to_array(rtrim(parent.path, '/'), '/') AS bigint[]))
+                          WHERE parent.id = page.parent_id), '') AS folder_path
+          FROM page
+      ORDER BY rank DESC, is_folder DESC, id"""
+
+    with connections[router.db_for_read(models.File)].cursor() as cursor:
+        cursor.execute(query_sql, {'query': query, 'owner': user_pk, 'limit': limit,
+                                   'path': f'{path}%' if path is not None else None,
+                                   'after_rank': after_rank, 'after_is_folder': after_is_folder,
+                                   'after_id': after_id})
+        return dictfetchall(cursor)
+
+
+def rebuild_extension_stats():
+    """Recalculate extension statistics of all users from their files.
+
+    Must be called in a transaction. Return number of statistics rows.
+    """
+    query = """
+        INSERT INTO assets_fileextensionstats (owner_id, extension, count, total_bytes)
+        SELECT owner_id, COALESCE(extension, ''), count(*), sum(size)
+          FROM assets_file
+         WHERE is_uploaded
+      GROUP BY owner_id, COALESCE(extension, '')"""
+
+    with connection.cursor() as cursor:
+        # Concurrent updates wait, so they are applied after the rebuild.
+        cursor.execute('LOCK TABLE assets_fileextensionstats IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute('DELETE FROM assets_fileextensionstats')
+        cursor.execute(query)
+        return cursor.rowcount
 
 
 def get_personal_folders(user):
@@ -58,14 +274,14 @@ def get_personal_folders(user):
 
 def move_file(new_folder, uuid):
     """Move file in DB."""
-    file = models.File.objects.filter(relative_key__contains=uuid).first()
+    file = models.File.objects.filter(uuid=uuid).first()
     file.folder = new_folder
     file.save()
 
 
 def rename_file(file_uuid, new_title):
     """Rename file in DB."""
-    file = models.File.objects.filter(relative_key__contains=file_uuid).first()
+    file = models.File.objects.filter(uuid=file_uuid).first()
     file.title = new_title
     file.save()
 
@@ -89,7 +305,7 @@ def create_file(file_name, user, folder, key, size, extension):
 
 def delete_file(uuid):
     """Delete file form DB."""
-    models.File.objects.filter(relative_key__contains=uuid).delete()
+    models.File.objects.filter(uuid=uuid).delete()
 
 
 def create_folder(user, title, parent):
@@ -101,9 +317,19 @@ def create_folder(user, title, parent):
 
 def delete_shared_table(uuid):
     """Delete share table."""
-    models.SharedTable.objects.filter(file__relative_key__contains=uuid).delete()
+    models.SharedTable.objects.filter(file__uuid=uuid).delete()
+
+
+def get_shared_file(uuid, user_pk, permission):
+    """Return active share of the file with the user granting the permission or None.
+
+    Expiry and permission flag are checked in the query, the file is loaded
+    with the share.
+    """
+    return models.SharedTable.objects.active().with_permission(permission).select_related('file').filter(
+        file__uuid=uuid, user_id=user_pk).first()
 
 
-def delete_expired_shares():
-    now = timezone.now()
-    models.SharedTable.objects.filter(expired__lt=now).delete()
+def delete_expired_share(file, user):
+    """Delete expired share of the file with the user to share it again."""
+    models.SharedTable.objects.filter(file=file, user=user, expired__lte=timezone.now()).delete()
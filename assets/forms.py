@@ -26,7 +26,13 @@ class UpdateShareForm(forms.ModelForm):
 
     class Meta:
         model = models.SharedTable
-        fields = ['expired', 'permissions']
+        fields = ['expired']
+
+    def __init__(self, *args, **kwargs):
+        """Select permissions granted by the share."""
+        super().__init__(*args, **kwargs)
+        self.initial['permissions'] = [permission for permission in models.Permissions.objects.all()
+                                       if self.instance.permission_flags & permission.flag]
 
     def clean_expired(self):
         if self.cleaned_data['expired'] < timezone.now():
@@ -34,6 +40,11 @@ class UpdateShareForm(forms.ModelForm):
 
         return self.cleaned_data['expired']
 
+    def save(self, commit=True):
+        """Save permissions as flags of the share."""
+        self.instance.permission_flags = models.Permissions.get_flags(self.cleaned_data['permissions'])
+        return super().save(commit)
+
 
 class CreateShareForm(forms.Form):
     """Form for create ShareTable."""
@@ -0,0 +1,42 @@
+"""Command for measuring overhead of database connections."""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    """Compare requests opening a new connection with persistent connection."""
+
+    help = 'Measure latency of simulated requests with new and persistent database connections.'
+
+    def add_arguments(self, parser):
+        """Add number of requests and queries per request arguments."""
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--queries', type=int, default=5,
+                            help='Number of tiny queries per request.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        """Print average latency of a request in both modes."""
+        if options['requests'] < 1 or options['queries'] < 1:
+            raise CommandError('Number of requests and queries must be positive.')
+
+        connection = connections[options['database']]
+        for title, persistent in (('New connection per request', False), ('Persistent connection', True)):
+            connection.close()
+            elapsed = self.run_requests(connection, options['requests'], options['queries'], persistent)
+            self.stdout.write(f'{title}: {elapsed / options["requests"] * 1000:.3f} ms per request')
+        connection.close()
+
+    def run_requests(self, connection, requests, queries, persistent):
+        """Return seconds spent on simulated requests."""
+        start = time.perf_counter()
+        for _ in range(requests):
+            with connection.cursor() as cursor:
+                for _ in range(queries):
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+            if not persistent:
+                connection.close()
+        return time.perf_counter() - start
@@ -0,0 +1,37 @@
+"""Command for switching the request profiler at runtime."""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """Turn on or off profiling of requests by the switch file."""
+
+    help = 'Turn on or off profiling of requests without restart.'
+
+    def add_arguments(self, parser):
+        """Add state and sample rate arguments."""
+        parser.add_argument('state', choices=['on', 'off', 'status'])
+        parser.add_argument('--rate', type=float, default=1.0,
+                            help='Share of requests to profile, from 0 to 1.')
+
+    def handle(self, *args, **options):
+        """Write or remove the switch file."""
+        if options['state'] == 'on':
+            if not 0 < options['rate'] <= 1:
+                raise CommandError('Rate must be greater than 0 and not greater than 1.')
+            os.makedirs(os.path.dirname(settings.PROFILER_SWITCH_FILE), exist_ok=True)
+            with open(settings.PROFILER_SWITCH_FILE, 'w') as switch_file:
+                switch_file.write(str(options['rate']))
+        elif options['state'] == 'off':
+            os.makedirs(os.path.dirname(settings.PROFILER_SWITCH_FILE), exist_ok=True)
+            with open(settings.PROFILER_SWITCH_FILE, 'w') as switch_file:
+                switch_file.write('0')
+
+        try:
+            with open(settings.PROFILER_SWITCH_FILE) as switch_file:
+                rate = switch_file.read().strip()
+        except OSError:
+            rate = settings.PROFILER_SAMPLE_RATE
+        self.stdout.write(f'Profiler sample rate: {rate}')
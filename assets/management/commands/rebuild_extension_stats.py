@@ -0,0 +1,17 @@
+"""Command for recalculating extension statistics of files."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from assets.db import queries
+
+
+class Command(BaseCommand):
+    """Recalculate count and size of files by owner and extension."""
+
+    help = 'Recalculate extension statistics of all users from their files.'
+
+    def handle(self, *args, **options):
+        """Replace extension statistics with recalculated ones."""
+        with transaction.atomic():
+            rows = queries.rebuild_extension_stats()
+        self.stdout.write(f'Extension statistics rows: {rows}')
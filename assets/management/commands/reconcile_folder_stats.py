@@ -0,0 +1,17 @@
+"""Command for recalculating size and count aggregates of folders."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from assets.db import queries
+
+
+class Command(BaseCommand):
+    """Recalculate total_size and file_count of all folders."""
+
+    help = 'Recalculate total size and file count of folders from their files.'
+
+    def handle(self, *args, **options):
+        """Fix folders with drifted aggregates."""
+        with transaction.atomic():
+            corrected = queries.reconcile_folder_stats()
+        self.stdout.write(f'Corrected folders: {corrected}')
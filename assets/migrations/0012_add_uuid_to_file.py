@@ -0,0 +1,44 @@
+# Generated by Django 3.0.14 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def get_uuid_from_key(relative_key):
+    """Return uuid part of the file's relative key as it was when the migration was written."""
+    return str(relative_key).split('/')[-1] or None
+
+
+def fill_uuids(apps, schema_editor):
+    model = apps.get_model('assets', 'File')
+    last_pk = 0
+    while True:
+        rows = list(model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'relative_key')[:BATCH_SIZE])
+        if not rows:
+            break
+        for row in rows:
+            row.uuid = get_uuid_from_key(row.relative_key)
+        model.objects.bulk_update(rows, ['uuid'])
+        last_pk = rows[-1].pk
+
+
+def reverse_uuids(apps, schema_editor):
+    model = apps.get_model('assets', 'File')
+    model.objects.update(uuid=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0011_auto_20211106_1140'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='uuid',
+            field=models.CharField(editable=False, max_length=36, null=True),
+        ),
+        migrations.RunPython(fill_uuids, reverse_code=reverse_uuids),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0012_add_uuid_to_file'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='file',
+            name='uuid',
+            field=models.CharField(editable=False, max_length=36, null=True, unique=True),
+        ),
+    ]
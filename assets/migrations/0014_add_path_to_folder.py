@@ -0,0 +1,35 @@
+# Generated by Django 3.0.14 on 2026-10-17 11:00
+
+from django.db import migrations, models
+
+FILL_PATHS = """
+    WITH RECURSIVE tree AS (
+        SELECT id, id::text || '/' AS path
+          FROM assets_folder
+         WHERE parent_id IS NULL
+         UNION ALL
+        SELECT folder.id, tree.path || folder.id::text || '/'
+          FROM assets_folder AS folder
+          JOIN tree ON folder.parent_id = tree.id
+    )
+    UPDATE assets_folder
+       SET path = tree.path
+      FROM tree
+     WHERE assets_folder.id = tree.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0013_unique_uuid_in_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=1024),
+        ),
+        migrations.RunSQL(FILL_PATHS, reverse_sql=migrations.RunSQL.noop),
+    ]
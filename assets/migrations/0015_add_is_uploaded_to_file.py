@@ -0,0 +1,23 @@
+# Generated by Django 3.0.14 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0014_add_path_to_folder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='is_uploaded',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='size',
+            field=models.BigIntegerField(),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-17 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0015_add_is_uploaded_to_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='upload_id',
+            field=models.CharField(editable=False, max_length=1024, null=True),
+        ),
+    ]
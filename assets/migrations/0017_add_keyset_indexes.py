@@ -0,0 +1,21 @@
+# Generated by Django 3.0.14 on 2026-10-17 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0016_add_upload_id_to_file'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['owner', 'folder', 'title', 'id'], name='assets_file_owner_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(fields=['owner', 'parent', 'title', 'id'], name='assets_folder_owner_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0017_add_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sharedtable',
+            name='expired',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
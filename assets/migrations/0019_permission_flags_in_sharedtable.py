@@ -0,0 +1,49 @@
+# Generated by Django 3.0.14 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+PERMISSION_FLAG = """
+    CASE p.name
+        WHEN 'read_only' THEN 1
+        WHEN 'rename_only' THEN 2
+        WHEN 'delete_only' THEN 4
+        ELSE 0
+    END
+"""
+
+FILL_FLAGS = f"""
+    UPDATE assets_sharedtable AS s
+       SET permission_flags = flags.value
+      FROM (SELECT sp.sharedtable_id, bit_or({PERMISSION_FLAG}) AS value
+              FROM assets_sharedtable_permissions AS sp
+              JOIN assets_permissions AS p ON p.id = sp.permissions_id
+          GROUP BY sp.sharedtable_id) AS flags
+     WHERE s.id = flags.sharedtable_id
+"""
+
+FILL_PERMISSIONS = f"""
+    INSERT INTO assets_sharedtable_permissions (sharedtable_id, permissions_id)
+    SELECT s.id, p.id
+      FROM assets_sharedtable AS s
+      JOIN assets_permissions AS p ON s.permission_flags & {PERMISSION_FLAG} <> 0
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0018_add_index_to_sharedtable_expired'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sharedtable',
+            name='permission_flags',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunSQL(FILL_FLAGS, reverse_sql=FILL_PERMISSIONS),
+        migrations.RemoveField(
+            model_name='sharedtable',
+            name='permissions',
+        ),
+    ]
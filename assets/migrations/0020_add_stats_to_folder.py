@@ -0,0 +1,48 @@
+# Generated by Django 3.0.14 on 2026-10-17 17:00
+
+from django.db import migrations, models
+
+FILL_STATS = """
+    WITH direct AS (
+        SELECT folder_id, sum(size) AS size, count(*) AS count
+          FROM assets_file
+         WHERE folder_id IS NOT NULL
+           AND is_uploaded
+      GROUP BY folder_id
+    ), totals AS (
+        SELECT ancestor_id::bigint AS id, sum(direct.size) AS size, sum(direct.count) AS count
+          FROM direct
+          JOIN assets_folder ON assets_folder.id = direct.folder_id,
+               unnest(string_to_array(rtrim(assets_folder.path, '/'), '/')) AS ancestor_id
+      GROUP BY ancestor_id
+    )
+    UPDATE assets_folder
+       SET total_size = COALESCE(totals.size, 0),
+           file_count = COALESCE(totals.count, 0)
+      FROM assets_folder AS folder
+      LEFT JOIN totals ON totals.id = folder.id
+     WHERE assets_folder.id = folder.id
+       AND (assets_folder.total_size, assets_folder.file_count)
+           IS DISTINCT FROM (COALESCE(totals.size, 0), COALESCE(totals.count, 0))
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0019_permission_flags_in_sharedtable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='file_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='total_size',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(FILL_STATS, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.0.14 on 2026-10-17 18:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FILL_USAGE = """
+    INSERT INTO assets_storageusage (user_id, used_size, file_count)
+    SELECT owner_id, sum(size), count(*)
+      FROM assets_file
+  GROUP BY owner_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('assets', '0020_add_stats_to_folder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageUsage',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='storage_usage', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('used_size', models.BigIntegerField(default=0)),
+                ('file_count', models.IntegerField(default=0)),
+                ('quota', models.BigIntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunSQL(FILL_USAGE, reverse_sql=migrations.RunSQL.noop),
+    ]
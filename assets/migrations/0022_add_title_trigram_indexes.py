@@ -0,0 +1,29 @@
+# Generated by Django 3.0.14 on 2026-10-18 00:10
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Indexes are built concurrently not to lock tables with files of all users.
+INDEXES = {
+    'assets_file_title_trgm_idx': 'assets_file',
+    'assets_folder_title_trgm_idx': 'assets_folder',
+}
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('assets', '0021_add_storage_usage'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+    ] + [
+        migrations.RunSQL(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin (title gin_trgm_ops)',
+            f'DROP INDEX CONCURRENTLY IF EXISTS {name}',
+        )
+        for name, table in INDEXES.items()
+    ]
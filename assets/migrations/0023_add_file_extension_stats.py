@@ -0,0 +1,39 @@
+# Generated by Django 3.0.14 on 2026-10-18 01:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FILL_STATS = """
+    INSERT INTO assets_fileextensionstats (owner_id, extension, count, total_bytes)
+    SELECT owner_id, COALESCE(extension, ''), count(*), sum(size)
+      FROM assets_file
+     WHERE is_uploaded
+  GROUP BY owner_id, COALESCE(extension, '')
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('assets', '0022_add_title_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileExtensionStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('extension', models.CharField(blank=True, default='', max_length=255)),
+                ('count', models.IntegerField(default=0)),
+                ('total_bytes', models.BigIntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='extension_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='fileextensionstats',
+            constraint=models.UniqueConstraint(fields=('owner', 'extension'), name='assets_fileextensionstats_owner_extension_key'),
+        ),
+        migrations.RunSQL(FILL_STATS, reverse_sql=migrations.RunSQL.noop),
+    ]
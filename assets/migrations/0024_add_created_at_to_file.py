@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-18 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0023_add_file_extension_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+    ]
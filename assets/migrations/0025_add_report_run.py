@@ -0,0 +1,27 @@
+# Generated by Django 3.0.14 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0024_add_created_at_to_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schedule_id', models.IntegerField()),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('total_users', models.IntegerField()),
+                ('total_chunks', models.IntegerField()),
+                ('done_chunks', models.IntegerField(default=0)),
+                ('done_users', models.IntegerField(default=0)),
+                ('failed_users', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
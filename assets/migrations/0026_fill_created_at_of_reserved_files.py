@@ -0,0 +1,22 @@
+# Generated by Django 3.0.14 on 2026-10-18 04:00
+
+from django.db import migrations
+
+# Reservations made before created_at was tracked are reaped after the usual age.
+FILL_CREATED_AT = """
+    UPDATE assets_file
+       SET created_at = now()
+     WHERE created_at IS NULL
+       AND NOT is_uploaded
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0025_add_report_run'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FILL_CREATED_AT, reverse_sql=migrations.RunSQL.noop),
+    ]
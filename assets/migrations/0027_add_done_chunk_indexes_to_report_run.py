@@ -0,0 +1,19 @@
+# Generated by Django 3.0.14 on 2026-10-18 05:00
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0026_fill_created_at_of_reserved_files'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportrun',
+            name='done_chunk_indexes',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None),
+        ),
+    ]
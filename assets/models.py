@@ -2,10 +2,15 @@
 import uuid
 
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import Q
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat, Length, Substr
 from django.urls import reverse
+from django.utils import timezone
+
+from assets.utils import get_uuid_from_key
 
 
 class File(models.Model):
@@ -24,11 +29,17 @@ class File(models.Model):
                               related_name='files')
     # TODO: Divide relative_key.
     relative_key = models.CharField(max_length=255)
+    uuid = models.CharField(max_length=36, unique=True, null=True, editable=False)
     shared = models.ManyToManyField(settings.AUTH_USER_MODEL,
                                     through='SharedTable')
     thumbnail_key = models.CharField(max_length=255, null=True)
-    size = models.IntegerField()
+    size = models.BigIntegerField()
     extension = models.CharField(max_length=255, null=True)
+    # False while the file is reserved and its bytes are being uploaded to S3.
+    is_uploaded = models.BooleanField(default=True)
+    upload_id = models.CharField(max_length=1024, null=True, editable=False)
+    # Empty for files created before it was tracked.
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
 
     class Meta:
         """Metadata for File model."""
@@ -44,11 +55,40 @@ class File(models.Model):
                 condition=Q(folder=None),
             ),
         ]
+        indexes = [
+            models.Index(name='assets_file_owner_keyset_idx', fields=['owner', 'folder', 'title', 'id']),
+        ]
 
     def __str__(self):
         """Return title when called."""
         return self.title
 
+    def save(self, *args, **kwargs):
+        """Fill uuid from the last segment of relative_key."""
+        if self.uuid is None and self.relative_key:
+            self.uuid = get_uuid_from_key(self.relative_key)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def get_id_cache_key(uuid):
+        """Return cache key of the id of the file with the uuid."""
+        return f'file-id:{uuid}'
+
+    @property
+    def folder_stats(self):
+        """Return folder, size and count the file adds to folder aggregates."""
+        if not self.is_uploaded:
+            return self.folder_id, 0, 0
+        return self.folder_id, self.size, 1
+
+    @property
+    def extension_stats(self):
+        """Return owner, extension, size and count the file adds to extension statistics."""
+        extension = self.extension or ''
+        if not self.is_uploaded:
+            return self.owner_id, extension, 0, 0
+        return self.owner_id, extension, self.size, 1
+
     def clean(self):
         """Check exist file with same title."""
         if File.objects.filter(title=self.title, owner=self.owner, folder=self.folder).first():
@@ -70,6 +110,11 @@ class Folder(models.Model):
                               on_delete=models.PROTECT,
                               related_name='folders')
     uuid = models.UUIDField(default=uuid.uuid4, editable=False)
+    # Materialized path of ancestors' pks including own pk, e.g. '1/5/9/'.
+    path = models.CharField(max_length=1024, db_index=True, editable=False, default='')
+    # Size and count of uploaded files in the whole subtree.
+    total_size = models.BigIntegerField(default=0, editable=False)
+    file_count = models.IntegerField(default=0, editable=False)
 
     class Meta:
         """Metadata for Folder model."""
@@ -85,6 +130,9 @@ class Folder(models.Model):
                 condition=Q(parent=None)
             )
         ]
+        indexes = [
+            models.Index(name='assets_folder_owner_keyset_idx', fields=['owner', 'parent', 'title', 'id']),
+        ]
 
     def __str__(self):
         """Return title when called."""
@@ -94,12 +142,156 @@ class Folder(models.Model):
         """Return absolute url of object."""
         return reverse('folder_page', kwargs={'folder_id': self.pk})
 
+    def save(self, *args, **kwargs):
+        """Save folder and keep materialized path of the subtree consistent.
+
+        Path and aggregates are updated only by queries, so the existing
+        folder is saved without them.
+        """
+        if self.pk is not None and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and
+                                       field.name not in ('path', 'total_size', 'file_count')]
+        super().save(*args, **kwargs)
+        if self.path and self.path_parent_id == self.parent_id:
+            return
+
+        parent_path = Folder.objects.get(pk=self.parent_id).path if self.parent_id else ''
+        new_path = f'{parent_path}{self.pk}/'
+        if self.path == new_path:
+            return
+
+        old_path = Folder.objects.filter(pk=self.pk).values_list('path', flat=True).get()
+        if old_path:
+            Folder.objects.filter(path__startswith=old_path).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)))
+            stats = Folder.objects.filter(pk=self.pk).values('total_size', 'file_count').get()
+            Folder.update_stats(old_path.split('/')[:-2], -stats['total_size'], -stats['file_count'])
+            Folder.update_stats(new_path.split('/')[:-2], stats['total_size'], stats['file_count'])
+        else:
+            Folder.objects.filter(pk=self.pk).update(path=new_path)
+        self.path = new_path
+
+    @staticmethod
+    def update_stats(folder_ids, size, count):
+        """Add size and count of files to aggregates of folders."""
+        if folder_ids and (size or count):
+            Folder.objects.filter(pk__in=folder_ids).update(total_size=F('total_size') + size,
+                                                            file_count=F('file_count') + count)
+
+    @property
+    def path_parent_id(self):
+        """Return parent's pk stored in materialized path."""
+        ids = self.path.split('/')[:-1]
+        return int(ids[-2]) if len(ids) > 1 else None
+
+    def subtree(self):
+        """Return queryset with folder itself and all nested folders."""
+        return Folder.objects.filter(owner_id=self.owner_id, path__startswith=self.path)
+
+    def descendants(self):
+        """Return queryset with all nested folders."""
+        return self.subtree().exclude(pk=self.pk)
+
+    def ancestors(self):
+        """Return queryset with parent folders ordered from the root."""
+        ancestor_ids = self.path.split('/')[:-2]
+        return Folder.objects.filter(pk__in=ancestor_ids).order_by(Length('path'))
+
     def clean(self):
         """Check exist folder with same title."""
         if Folder.objects.filter(title=self.title, owner=self.owner, parent=self.parent).first():
             raise ValidationError('Current folder already exists.')
 
 
+class StorageUsage(models.Model):
+    """Size and count of all files of a user, including reserved ones."""
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='storage_usage')
+    used_size = models.BigIntegerField(default=0)
+    file_count = models.IntegerField(default=0)
+    # Overrides USER_STORAGE_QUOTA for the user.
+    quota = models.BigIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        """Return user and used size when called."""
+        return f'{self.user_id}: {self.used_size} of {self.get_quota()}'
+
+    def get_quota(self):
+        """Return storage limit of the user in bytes."""
+        return self.quota if self.quota is not None else settings.USER_STORAGE_QUOTA
+
+    @classmethod
+    def update_usage(cls, user_id, size, count):
+        """Add size and count of files to usage of the user."""
+        if not (size or count):
+            return
+
+        values = {'used_size': F('used_size') + size, 'file_count': F('file_count') + count}
+        if not cls.objects.filter(user_id=user_id).update(**values):
+            cls.objects.get_or_create(user_id=user_id)
+            cls.objects.filter(user_id=user_id).update(**values)
+
+
+class FileExtensionStats(models.Model):
+    """Count and size of uploaded files of a user with the extension."""
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL,
+                              on_delete=models.CASCADE,
+                              related_name='extension_stats')
+    # Files without extension are counted with empty one.
+    extension = models.CharField(max_length=255, blank=True, default='')
+    count = models.IntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
+
+    class Meta:
+        """Metadata for FileExtensionStats model."""
+
+        constraints = [
+            models.UniqueConstraint(
+                name='assets_fileextensionstats_owner_extension_key',
+                fields=['owner', 'extension'],
+            ),
+        ]
+
+    def __str__(self):
+        """Return owner, extension and count when called."""
+        return f'{self.owner_id}: {self.extension} {self.count}'
+
+    @classmethod
+    def update_stats(cls, owner_id, extension, size, count):
+        """Add size and count of files to statistics of the owner's extension."""
+        if not (size or count):
+            return
+
+        values = {'total_bytes': F('total_bytes') + size, 'count': F('count') + count}
+        if not cls.objects.filter(owner_id=owner_id, extension=extension).update(**values):
+            cls.objects.get_or_create(owner_id=owner_id, extension=extension)
+            cls.objects.filter(owner_id=owner_id, extension=extension).update(**values)
+
+
+class ReportRun(models.Model):
+    """Progress of a scheduled reports run, updated by Celery tasks."""
+
+    schedule_id = models.IntegerField()
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    total_users = models.IntegerField()
+    total_chunks = models.IntegerField()
+    done_chunks = models.IntegerField(default=0)
+    # Indexes of completed chunks, so a redelivered chunk is not counted twice.
+    done_chunk_indexes = ArrayField(models.IntegerField(), default=list, blank=True)
+    done_users = models.IntegerField(default=0)
+    failed_users = models.IntegerField(default=0)
+
+    def __str__(self):
+        """Return schedule and progress when called."""
+        return f'{self.schedule_id}: {self.done_users} of {self.total_users}'
+
+
 class Permissions(models.Model):
     """Permissions for ShareTable."""
 
@@ -107,21 +299,69 @@ class Permissions(models.Model):
     RENAME_ONLY = 'rename_only'
     DELETE_ONLY = 'delete_only'
 
+    FLAGS = {
+        READ_ONLY: 1,
+        RENAME_ONLY: 2,
+        DELETE_ONLY: 4,
+    }
+
     title = models.CharField(max_length=255)
     name = models.CharField(max_length=255)
 
     def __str__(self):
         return self.title
 
+    @property
+    def flag(self):
+        """Return bit of the permission in SharedTable.permission_flags."""
+        return self.FLAGS.get(self.name, 0)
+
+    @classmethod
+    def get_flags(cls, permissions):
+        """Return permission flags combined from permissions."""
+        flags = 0
+        for permission in permissions:
+            flags |= permission.flag
+        return flags
+
+
+class SharedTableQuerySet(models.QuerySet):
+    """QuerySet of shares."""
+
+    def active(self):
+        """Return shares which are not expired.
+
+        Expired shares are removed by a periodic task, so they must be
+        filtered out on read.
+        """
+        return self.filter(expired__gt=timezone.now())
+
+    def with_permission(self, name):
+        """Return shares which grant the permission."""
+        flag = Permissions.FLAGS[name]
+        return self.annotate(granted_flag=F('permission_flags').bitand(flag)).filter(granted_flag=flag)
+
 
 class SharedTable(models.Model):
     """Model for managing sharing."""
 
     file = models.ForeignKey(File, on_delete=models.PROTECT)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name='shared_files')
-    permissions = models.ManyToManyField(Permissions)
+    permission_flags = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
-    expired = models.DateTimeField()
+    expired = models.DateTimeField(db_index=True)
+
+    objects = SharedTableQuerySet.as_manager()
+
+    @staticmethod
+    def get_cache_key(user_pk, file_pk, permission):
+        """Return cache key of the share of the file with the user granting the permission."""
+        return f'shared-file:{user_pk}:{file_pk}:{permission}'
+
+    @classmethod
+    def get_cache_keys(cls, user_pk, file_pk):
+        """Return cache keys of the share of the file with the user for all permissions."""
+        return [cls.get_cache_key(user_pk, file_pk, permission) for permission in Permissions.FLAGS]
 
     class Meta:
         """Metadata for model."""
@@ -134,4 +374,24 @@ class SharedTable(models.Model):
         ]
 
     def __str__(self):
-        return str(self.file.title) + ' ' + str(self.user)
+        """Return file and user when called."""
+        return f'{self.file_id}: {self.user_id}'
+
+    def has_permission(self, name):
+        """Check if the share grants the permission."""
+        return bool(self.permission_flags & Permissions.FLAGS[name])
+
+    @property
+    def can_read(self):
+        """Check if the file can be downloaded."""
+        return self.has_permission(Permissions.READ_ONLY)
+
+    @property
+    def can_rename(self):
+        """Check if the file can be renamed."""
+        return self.has_permission(Permissions.RENAME_ONLY)
+
+    @property
+    def can_delete(self):
+        """Check if the file can be deleted."""
+        return self.has_permission(Permissions.DELETE_ONLY)
@@ -0,0 +1,159 @@
+"""Paginations for API of assets app."""
+import base64
+import binascii
+from collections import OrderedDict
+import json
+import math
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+BIGINT_LIMIT = 2 ** 63
+
+
+def encode_cursor(values):
+    """Encode ordering values to opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, types):
+    """Decode ordering values from cursor.
+
+    'types' has a type or a tuple of types for each value, None in the
+    tuple allows null. Raise ValueError if cursor is malformed or its
+    values do not match 'types', so they are safe to pass to queries.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError('Invalid cursor')
+    for value, value_types in zip(values, types):
+        if not is_cursor_value(value, value_types if isinstance(value_types, tuple) else (value_types,)):
+            raise ValueError('Invalid cursor')
+    return values
+
+
+def is_cursor_value(value, types):
+    """Check value of cursor has one of types and fits to database column."""
+    if value is None:
+        return None in types
+    if type(value) not in types:
+        return False
+    if type(value) is int:
+        return -BIGINT_LIMIT <= value < BIGINT_LIMIT
+    if type(value) is float:
+        return math.isfinite(value)
+    if type(value) is str:
+        return '\x00' not in value
+    return True
+
+
+class KeysetPagination(pagination.BasePagination):
+    """Keyset pagination over ordering fields of the view.
+
+    Each page is selected with an index range condition instead of OFFSET,
+    so any page costs the same. The first field may be nullable, NULLs go
+    last as in PostgreSQL ascending order. The view sets fields in
+    'keyset_ordering' attribute, the last one must be unique, and types of
+    their values in 'keyset_types' as decode_cursor() takes them.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return a page of objects after the cursor."""
+        self.request = request
+        self.ordering = view.keyset_ordering
+        self.types = view.keyset_types
+        self.page_size = self.get_page_size(request)
+
+        values = self.decode_cursor(request)
+        queryset = queryset.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(self.get_keyset_filter(values))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_cursor = self.encode_cursor(results[-1]) if self.has_next else None
+        return results
+
+    def paginate_rows(self, fetch_rows, request, view=None):
+        """Return a page of rows of a raw query after the cursor.
+
+        'fetch_rows' is called with ordering values of the cursor and limit
+        and returns rows as dicts.
+        """
+        self.request = request
+        self.ordering = view.keyset_ordering
+        self.types = view.keyset_types
+        self.page_size = self.get_page_size(request)
+
+        rows = fetch_rows(self.decode_cursor(request), self.page_size + 1)
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_cursor = encode_cursor([rows[-1][field] for field in self.ordering]) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        """Return page with link to the next one."""
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+    def get_page_size(self, request):
+        """Return page size from query params limited by API_MAX_PAGE_SIZE."""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.API_PAGE_SIZE
+        return max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+    def get_next_link(self):
+        """Return URL of the next page."""
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_keyset_filter(self, values):
+        """Return condition selecting objects placed after values."""
+        (first_field, *fields), (first_value, *rest_values) = self.ordering, values
+
+        rest_filter = None
+        for field, value in reversed(list(zip(fields, rest_values))):
+            keyset_filter = Q(**{f'{field}__gt': value})
+            if rest_filter is not None:
+                keyset_filter |= Q(**{field: value}) & rest_filter
+            rest_filter = keyset_filter
+
+        if first_value is None:
+            return Q(**{f'{first_field}__isnull': True}) & rest_filter
+        return (Q(**{f'{first_field}__gt': first_value}) |
+                Q(**{f'{first_field}__isnull': True}) |
+                (Q(**{first_field: first_value}) & rest_filter))
+
+    def encode_cursor(self, instance):
+        """Encode ordering values of the object to cursor."""
+        return encode_cursor([getattr(instance, field) for field in self.ordering])
+
+    def decode_cursor(self, request):
+        """Decode ordering values from cursor."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor is None:
+            return None
+
+        try:
+            return decode_cursor(cursor, self.types)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
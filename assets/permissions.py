@@ -1,6 +1,13 @@
 """All custom permissions."""
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import permissions
 
+from assets import models
+from assets.db import queries
+
 
 class IsObjectOwner(permissions.BasePermission):
     """Permission to check if a folder is owned by a user."""
@@ -9,3 +16,64 @@ class IsObjectOwner(permissions.BasePermission):
         """Check if a object is owned by a user."""
         return obj.owner == request.user
 
+
+class SharedFile:
+    """File shared with a user by a share granting the requested permission."""
+
+    def __init__(self, file_id, share_id, expired, file=None):
+        """Set share data, the file is loaded on first access if it is not given."""
+        self.file_id = file_id
+        self.share_id = share_id
+        self.expired = expired
+        self._file = file
+
+    @property
+    def file(self):
+        """Return shared file, raise Http404 if it was deleted after the share was cached."""
+        if self._file is None:
+            self._file = get_object_or_404(models.File, pk=self.file_id)
+        return self._file
+
+
+def get_shared_file(request, uuid, permission):
+    """Return file shared with the user of request with the permission or None.
+
+    The result is memoized for the request. Share data without the file is
+    cached by file id for SHARED_FILE_CACHE_TIMEOUT seconds if it is set,
+    so changed shares are invalidated without loading their files.
+    """
+    memo = getattr(request, '_shared_files', None)
+    if memo is None:
+        memo = request._shared_files = {}
+
+    if (uuid, permission) not in memo:
+        memo[uuid, permission] = load_shared_file(request.user.pk, uuid, permission)
+    return memo[uuid, permission]
+
+
+def load_shared_file(user_pk, uuid, permission):
+    """Return file shared with the user with the permission from cache or DB."""
+    id_cache_key = models.File.get_id_cache_key(uuid)
+    if settings.SHARED_FILE_CACHE_TIMEOUT:
+        file_id = cache.get(id_cache_key)
+        cached = cache.get(models.SharedTable.get_cache_key(user_pk, file_id, permission)) if file_id else None
+        if cached is not None:
+            shared_file = SharedFile(*cached)
+            return shared_file if shared_file.expired > timezone.now() else None
+
+    share = queries.get_shared_file(uuid, user_pk, permission)
+    if share is None:
+        return None
+
+    if settings.SHARED_FILE_CACHE_TIMEOUT:
+        cache.set_many({
+            id_cache_key: share.file_id,
+            models.SharedTable.get_cache_key(user_pk, share.file_id, permission): (
+                share.file_id, share.pk, share.expired),
+        }, settings.SHARED_FILE_CACHE_TIMEOUT)
+    return SharedFile(share.file_id, share.pk, share.expired, share.file)
+
+
+def invalidate_shared_file(user_pk, file_pk):
+    """Remove cached shares of the file with the user."""
+    cache.delete_many(models.SharedTable.get_cache_keys(user_pk, file_pk))
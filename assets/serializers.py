@@ -1,12 +1,16 @@
 """All serializers."""
 import bleach
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core import exceptions
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework import serializers
 
 from assets import models
+from assets import validators
+from assets.db import queries
 
 
 class FolderRetrieveUpdateSerializer(serializers.ModelSerializer):
@@ -14,8 +18,8 @@ class FolderRetrieveUpdateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = models.Folder
-        fields = ('title', 'parent', 'uuid')
-        read_only_fields = ('uuid',)
+        fields = ('title', 'parent', 'uuid', 'total_size', 'file_count')
+        read_only_fields = ('uuid', 'total_size', 'file_count')
 
     def validate_title(self, data):
         """Sanitize the field from HTML tags."""
@@ -90,10 +94,41 @@ class FolderListCreateSerializer(serializers.ModelSerializer):
         return instance
 
 
+class PermissionFlagsField(serializers.Field):
+    """Permission flags of share represented as a list of Permissions ids."""
+
+    default_error_messages = {
+        'not_a_list': 'Expected a list of items but got type "{input_type}".',
+        'does_not_exist': 'Invalid pk "{pk_value}" - object does not exist.',
+    }
+
+    def get_permissions(self):
+        """Return all permissions loaded once for the field."""
+        if not hasattr(self, '_permissions'):
+            self._permissions = list(models.Permissions.objects.all())
+        return self._permissions
+
+    def to_representation(self, value):
+        """Return ids of permissions granted by flags."""
+        return [permission.pk for permission in self.get_permissions() if value & permission.flag]
+
+    def to_internal_value(self, data):
+        """Return flags of permissions with given ids."""
+        if not isinstance(data, list):
+            self.fail('not_a_list', input_type=type(data).__name__)
+
+        permissions = {permission.pk: permission for permission in self.get_permissions()}
+        try:
+            return models.Permissions.get_flags(permissions[int(pk)] for pk in data)
+        except (KeyError, TypeError, ValueError):
+            self.fail('does_not_exist', pk_value=data)
+
+
 class ShareListCreateSerializer(serializers.ModelSerializer):
     """Serializer for List and Create methods for ShareTable."""
 
     email = serializers.EmailField(write_only=True)
+    permissions = PermissionFlagsField(source='permission_flags')
 
     class Meta:
         model = models.SharedTable
@@ -114,18 +149,17 @@ class ShareListCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         """Override this method to validate exist share."""
-        if models.SharedTable.objects.filter(file=validated_data.get('file').pk,
-                                             user=User.objects.filter(
-                                                 email=validated_data.get('email')).first()).exists():
+        user = User.objects.filter(email=validated_data.get('email')).first()
+        queries.delete_expired_share(validated_data.get('file'), user)
+        if models.SharedTable.objects.filter(file=validated_data.get('file').pk, user=user).exists():
             raise serializers.ValidationError({'detail': 'Current share already exists.'})
 
         instance = models.SharedTable.objects.create(
             file=validated_data.get('file'),
-            user=User.objects.filter(email=validated_data.get('email')).first(),
-            expired=validated_data.get('expired')
+            user=user,
+            expired=validated_data.get('expired'),
+            permission_flags=validated_data.get('permission_flags')
         )
-        instance.permissions.set(validated_data.get('permissions'))
-        instance.save()
 
         return instance
 
@@ -133,6 +167,8 @@ class ShareListCreateSerializer(serializers.ModelSerializer):
 class ShareUpdateDestroySerializer(serializers.ModelSerializer):
     """Serializer for update and delete share's methods."""
 
+    permissions = PermissionFlagsField(source='permission_flags')
+
     class Meta:
         model = models.SharedTable
         fields = ('id', 'expired', 'user', 'file', 'permissions',)
@@ -172,6 +208,8 @@ class CreateThumbnailSerializer(serializers.Serializer):
 class RetrieveListSharedFilesSerializer(serializers.ModelSerializer):
     """Serializer for retrieve list of shared files with user."""
 
+    permissions = PermissionFlagsField(source='permission_flags', read_only=True)
+
     class Meta:
         model = models.SharedTable
         fields = ('id', 'file', 'expired', 'permissions',)
@@ -192,6 +230,12 @@ class FileListCreateSerializer(serializers.ModelSerializer):
         """Sanitize the field from HTML tags."""
         return bleach.clean(data, tags=[], strip=True)
 
+    def validate_size(self, data):
+        """Validate size of the file is not negative."""
+        if data < 0:
+            raise serializers.ValidationError({'detail': 'Invalid size of the file.'})
+        return data
+
     def create(self, validated_data):
         """Override this method to validate exist file."""
 
@@ -202,11 +246,103 @@ class FileListCreateSerializer(serializers.ModelSerializer):
 
         folder = models.Folder.objects.filter(uuid=validated_data.get('folder')).first()
 
-        instance = models.File.objects.create(title=validated_data.get('title'),
-                                              owner=validated_data.get('owner'),
-                                              folder=folder,
-                                              extension=validated_data.get('extension'),
-                                              size=validated_data.get('size'),
-                                              relative_key=validated_data.get('relative_key'))
+        with transaction.atomic():
+            if not validators.validate_storage_quota(validated_data.get('owner'), validated_data.get('size')):
+                raise serializers.ValidationError({'detail': 'Storage quota exceeded.'})
+
+            instance = models.File.objects.create(title=validated_data.get('title'),
+                                                  owner=validated_data.get('owner'),
+                                                  folder=folder,
+                                                  extension=validated_data.get('extension'),
+                                                  size=validated_data.get('size'),
+                                                  relative_key=validated_data.get('relative_key'),
+                                                  is_uploaded=validated_data.get('is_uploaded', True))
 
         return instance
+
+
+class FileListSerializer(serializers.ModelSerializer):
+    """Serializer for list of files."""
+
+    folder = serializers.CharField(source='folder.title', default=None)
+    relative_key = serializers.CharField(source='uuid')
+
+    class Meta:
+        model = models.File
+        fields = ('title', 'folder', 'extension', 'size', 'relative_key')
+        read_only_fields = fields
+
+
+class SearchResultSerializer(serializers.Serializer):
+    """Serializer for files and folders found by title."""
+
+    title = serializers.CharField()
+    uuid = serializers.CharField()
+    is_folder = serializers.BooleanField()
+    folder_path = serializers.CharField()
+    size = serializers.IntegerField(allow_null=True)
+    rank = serializers.FloatField()
+
+
+class FileUploadSerializer(FileListCreateSerializer):
+    """Serializer for reserving a file before direct upload to S3."""
+
+    content_type = serializers.CharField(max_length=255, write_only=True, default='application/octet-stream')
+
+    class Meta:
+        model = models.File
+        fields = ('title', 'folder', 'size', 'content_type', 'uuid')
+        read_only_fields = ('uuid',)
+        extra_kwargs = {'title': {'required': True},
+                        'size': {'required': True}}
+
+    def get_max_size(self):
+        """Return upload limit of the file."""
+        return settings.AWS_S3_MAX_UPLOAD_SIZE
+
+    def validate_size(self, data):
+        """Validate size of the file with upload limit."""
+        if data < 0 or data > self.get_max_size():
+            raise serializers.ValidationError({'detail': 'Invalid size of the file.'})
+        return data
+
+    def create(self, validated_data):
+        """Override this method to reserve not uploaded file."""
+        validated_data.pop('content_type', None)
+        return super().create({**validated_data, 'is_uploaded': False})
+
+
+class MultipartUploadSerializer(FileUploadSerializer):
+    """Serializer for reserving a file before multipart upload to S3."""
+
+    def get_max_size(self):
+        """Return upload limit of the file."""
+        return settings.AWS_S3_MAX_MULTIPART_UPLOAD_SIZE
+
+
+class UploadPartsSerializer(serializers.Serializer):
+    """Serializer for part numbers of multipart upload."""
+
+    part_numbers = serializers.ListField(child=serializers.IntegerField(min_value=1, max_value=10000),
+                                         min_length=1,
+                                         max_length=1000)
+
+
+class StorageUsageSerializer(serializers.ModelSerializer):
+    """Serializer for storage usage of user."""
+
+    quota = serializers.IntegerField(source='get_quota')
+
+    class Meta:
+        model = models.StorageUsage
+        fields = ('used_size', 'file_count', 'quota')
+        read_only_fields = fields
+
+
+class FileUploadCompleteSerializer(serializers.ModelSerializer):
+    """Serializer for uploaded file."""
+
+    class Meta:
+        model = models.File
+        fields = ('uuid', 'title', 'size', 'extension')
+        read_only_fields = fields
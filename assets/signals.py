@@ -0,0 +1,80 @@
+"""Signal handlers of assets app."""
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from assets import models
+from assets import permissions
+from assets.db import queries
+
+
+@receiver(post_save, sender=models.SharedTable)
+@receiver(post_delete, sender=models.SharedTable)
+def invalidate_share(sender, instance, **kwargs):
+    """Drop cached permissions of the changed share."""
+    permissions.invalidate_shared_file(instance.user_id, instance.file_id)
+
+
+STATS_FIELDS = {'folder_id', 'owner_id', 'size', 'is_uploaded', 'extension'}
+EMPTY_STATS = (None, 0, 0), (None, 0), (None, '', 0, 0)
+
+
+def get_stats(file):
+    """Return what the file adds to folder aggregates, storage usage and extension statistics."""
+    return file.folder_stats, (file.owner_id, file.size), file.extension_stats
+
+
+@receiver(post_init, sender=models.File)
+def remember_stats(sender, instance, **kwargs):
+    """Remember what the loaded file adds to folder aggregates, storage usage and extension statistics."""
+    if instance.pk is None:
+        instance._stats = EMPTY_STATS
+    elif STATS_FIELDS & instance.get_deferred_fields():
+        instance._stats = None
+    else:
+        instance._stats = get_stats(instance)
+
+
+@receiver(pre_save, sender=models.File)
+def load_stats(sender, instance, **kwargs):
+    """Load saved state of the file if its fields were deferred."""
+    if instance._stats is None:
+        saved_file = models.File.objects.filter(pk=instance.pk).first()
+        instance._stats = get_stats(saved_file) if saved_file else EMPTY_STATS
+
+
+@receiver(post_save, sender=models.File)
+def update_stats(sender, instance, **kwargs):
+    """Apply changes of the file to folder aggregates, storage usage and extension statistics."""
+    (old_folder_id, old_size, old_count), (old_owner_id, old_used_size), old_extension_stats = instance._stats
+    (folder_id, size, count), (owner_id, used_size), extension_stats = instance._stats = get_stats(instance)
+    if old_folder_id == folder_id:
+        queries.update_folder_stats(folder_id, size - old_size, count - old_count)
+    else:
+        queries.update_folder_stats(old_folder_id, -old_size, -old_count)
+        queries.update_folder_stats(folder_id, size, count)
+
+    if old_owner_id == owner_id:
+        models.StorageUsage.update_usage(owner_id, used_size - old_used_size, 0)
+    else:
+        if old_owner_id is not None:
+            models.StorageUsage.update_usage(old_owner_id, -old_used_size, -1)
+        models.StorageUsage.update_usage(owner_id, used_size, 1)
+
+    (old_owner_id, old_extension, old_size, old_count), (owner_id, extension, size, count) = \
+        old_extension_stats, extension_stats
+    if (old_owner_id, old_extension) == (owner_id, extension):
+        models.FileExtensionStats.update_stats(owner_id, extension, size - old_size, count - old_count)
+    else:
+        if old_owner_id is not None:
+            models.FileExtensionStats.update_stats(old_owner_id, old_extension, -old_size, -old_count)
+        models.FileExtensionStats.update_stats(owner_id, extension, size, count)
+
+
+@receiver(post_delete, sender=models.File)
+def remove_stats(sender, instance, **kwargs):
+    """Remove the deleted file from folder aggregates, storage usage and extension statistics."""
+    folder_id, size, count = instance.folder_stats
+    queries.update_folder_stats(folder_id, -size, -count)
+    models.StorageUsage.update_usage(instance.owner_id, -instance.size, -1)
+    owner_id, extension, size, count = instance.extension_stats
+    models.FileExtensionStats.update_stats(owner_id, extension, -size, -count)
@@ -0,0 +1,174 @@
+"""Tests for middlewares of cloud_assets project."""
+import os
+import tempfile
+from unittest.mock import patch
+
+from django import http
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings, RequestFactory, SimpleTestCase, TestCase
+
+from assets.models import File
+from cloud_assets import routers
+from cloud_assets.middleware import DatabaseHealthCheckMiddleware, ProfilerMiddleware, ReplicaStickinessMiddleware
+
+
+class TestProfilerMiddleware(TestCase):
+    """Tests for ProfilerMiddleware."""
+
+    def setUp(self) -> None:
+        """Set default values for each test."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.profiler_dir = os.path.join(self.temp_dir.name, 'profilers')
+        self.settings = override_settings(PROFILER_DIR=self.profiler_dir,
+                                          PROFILER_SWITCH_FILE=os.path.join(self.profiler_dir, 'enabled'),
+                                          PROFILER_MAX_FILES=2,
+                                          PROFILER_SAMPLE_RATE=0,
+                                          PROFILER_TOKEN='secret')
+        self.settings.enable()
+        self.factory = RequestFactory()
+
+    def tearDown(self) -> None:
+        """Remove profiler files."""
+        self.settings.disable()
+        self.temp_dir.cleanup()
+
+    def get_stats(self):
+        """Auxiliary func for tests."""
+        if not os.path.exists(self.profiler_dir):
+            return []
+        return [name for name in os.listdir(self.profiler_dir) if name.endswith('.prof')]
+
+    def request(self, **headers):
+        """Auxiliary func for tests."""
+        middleware = ProfilerMiddleware(lambda request: http.HttpResponse())
+        return middleware(self.factory.get('/assets/files/', **headers))
+
+    def test_not_sampled(self):
+        """Test requests are not profiled by default."""
+        self.assertEqual(self.request().status_code, 200)
+        self.assertEqual(self.get_stats(), [])
+
+    def test_header(self):
+        """Test request with the profiler token is profiled."""
+        self.request(HTTP_X_PROFILE='secret')
+        self.assertEqual(len(self.get_stats()), 1)
+        self.assertTrue(self.get_stats()[0].endswith('_GET_assets_files.prof'))
+
+    def test_header_wrong_token(self):
+        """Test request with a wrong token is not profiled."""
+        self.request(HTTP_X_PROFILE='wrong')
+        self.assertEqual(self.get_stats(), [])
+
+    def test_rotation(self):
+        """Test only the newest files are kept."""
+        for _ in range(4):
+            self.request(HTTP_X_PROFILE='secret')
+        self.assertEqual(len(self.get_stats()), 2)
+
+    def test_runtime_switch(self):
+        """Test profiling is turned on and off by the command."""
+        call_command('profiler', 'on', stdout=open(os.devnull, 'w'))
+        self.request()
+        self.assertEqual(len(self.get_stats()), 1)
+
+        call_command('profiler', 'off', stdout=open(os.devnull, 'w'))
+        self.request()
+        self.assertEqual(len(self.get_stats()), 1)
+
+
+class TestDatabaseHealthCheckMiddleware(TestCase):
+    """Tests for DatabaseHealthCheckMiddleware."""
+
+    def request(self):
+        """Auxiliary func for tests."""
+        middleware = DatabaseHealthCheckMiddleware(lambda request: http.HttpResponse())
+        return middleware(RequestFactory().get('/assets/files/'))
+
+    def test_usable_connection_kept(self):
+        """Test a working connection is not closed."""
+        with patch.object(connection, 'close') as close:
+            self.assertEqual(self.request().status_code, 200)
+        close.assert_not_called()
+
+    def test_broken_connection_closed(self):
+        """Test a broken connection is closed before the request."""
+        with patch.object(connection, 'is_usable', return_value=False), \
+                patch.object(connection, 'close') as close:
+            self.assertEqual(self.request().status_code, 200)
+        close.assert_called_once_with()
+
+    def test_health_checks_disabled(self):
+        """Test connections are not checked without CONN_HEALTH_CHECKS."""
+        with patch.dict(connection.settings_dict, CONN_HEALTH_CHECKS=False), \
+                patch.object(connection, 'is_usable') as is_usable:
+            self.request()
+        is_usable.assert_not_called()
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'], DB_REPLICA_STICKY_COOKIE='use_primary_db',
+                   DB_REPLICA_STICKY_SECONDS=5)
+class TestReplicaStickinessMiddleware(SimpleTestCase):
+    """Tests for ReplicaStickinessMiddleware and ReplicaRouter."""
+
+    databases = {'default'}
+
+    def setUp(self) -> None:
+        """Set default values for each test."""
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.read_dbs = []
+
+    def request(self, request, write=False):
+        """Auxiliary func for tests."""
+        def get_response(request):
+            self.read_dbs.append(self.router.db_for_read(File))
+            if write:
+                self.router.db_for_write(File)
+                self.read_dbs.append(self.router.db_for_read(File))
+            return http.HttpResponse()
+        return ReplicaStickinessMiddleware(get_response)(request)
+
+    def test_read_from_replica(self):
+        """Test reads of a safe request go to the replica."""
+        response = self.request(self.factory.get('/assets/files/'))
+        self.assertEqual(self.read_dbs, ['replica_0'])
+        self.assertNotIn('use_primary_db', response.cookies)
+
+    def test_read_your_writes(self):
+        """Test reads after a write go to the primary and the client is pinned."""
+        response = self.request(self.factory.get('/assets/files/'), write=True)
+        self.assertEqual(self.read_dbs, ['replica_0', 'default'])
+        self.assertEqual(response.cookies['use_primary_db']['max-age'], 5)
+        self.assertEqual(self.router.db_for_read(File), 'replica_0')
+
+    def test_raw_sql_write(self):
+        """Test a write with raw SQL pins the client to the primary."""
+        def get_response(request):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                self.read_dbs.append(self.router.db_for_read(File))
+                cursor.execute('UPDATE assets_file SET size = size WHERE false')
+                self.read_dbs.append(self.router.db_for_read(File))
+            return http.HttpResponse()
+        response = ReplicaStickinessMiddleware(get_response)(self.factory.get('/assets/files/'))
+        self.assertEqual(self.read_dbs, ['replica_0', 'default'])
+        self.assertEqual(response.cookies['use_primary_db']['max-age'], 5)
+
+    def test_sticky_cookie(self):
+        """Test a client with the cookie reads from the primary."""
+        request = self.factory.get('/assets/files/')
+        request.COOKIES['use_primary_db'] = '1'
+        self.request(request)
+        self.assertEqual(self.read_dbs, ['default'])
+
+    def test_unsafe_request(self):
+        """Test reads of an unsafe request go to the primary."""
+        self.request(self.factory.post('/assets/files/'))
+        self.assertEqual(self.read_dbs, ['default'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Test reads go to the primary without replicas."""
+        self.request(self.factory.get('/assets/files/'))
+        self.assertEqual(self.read_dbs, ['default'])
@@ -2,13 +2,16 @@
 
 import os
 import tempfile
+import threading
 import uuid
 
 from django.contrib.auth.models import User
-from django.db import IntegrityError
-from django.test import TestCase
+from django.db import connection, IntegrityError, transaction
+from django.test import override_settings, TestCase, TransactionTestCase
 
 from assets import models
+from assets import signals
+from assets import validators
 from assets.db import queries
 
 
@@ -59,13 +62,25 @@ class TestFileModel(TestCase):
     def test_rename_file_with_exist_name(self):
         """Test rename file with exist name."""
         current_file = models.File.objects.get(pk=self.get_current_id.pk)
-        queries.rename_file(file_uuid=current_file.pk, new_title=current_file.title)
+        queries.rename_file(file_uuid=current_file.uuid, new_title=current_file.title)
         current_file = models.File.objects.get(pk=self.get_current_id.pk)
         try:
             self.assertEqual(current_file.title, current_file.title)
         except IntegrityError:
             self.assertRaises(IntegrityError)
 
+    def test_uuid_from_relative_key(self):
+        """Test uuid is filled from relative_key."""
+        file_uuid = str(uuid.uuid4())
+        file = models.File.objects.create(title='test_uuid.txt',
+                                          owner=self.user,
+                                          folder=None,
+                                          relative_key=f'users/{self.user.pk}/assets/{file_uuid}',
+                                          extension='.txt',
+                                          size=1024)
+        self.assertEqual(file.uuid, file_uuid)
+        self.assertEqual(models.File.objects.get(uuid=file_uuid).pk, file.pk)
+
     def test_delete_file(self):
         """Test delete file."""
         current_file = models.File.objects.get(pk=self.get_current_id.pk)
@@ -130,3 +145,394 @@ class TestFolderModel(TestCase):
         queries.delete_recursive(folder_id=current_folder.pk)
         folder_exist = models.Folder.objects.filter(pk=current_folder.pk).exists()
         self.assertFalse(folder_exist)
+
+    def test_delete_folder_with_children(self):
+        """Test delete folder with nested folders and files."""
+        current_folder = models.Folder.objects.get(pk=self.get_current_id.pk)
+        child = models.Folder.objects.create(title='child', owner=self.user, parent=current_folder)
+        models.Folder.objects.create(title='grandchild', owner=self.user, parent=child)
+        models.File.objects.create(title='file.txt',
+                                   owner=self.user,
+                                   folder=child,
+                                   relative_key=str(uuid.uuid4()),
+                                   extension='.txt',
+                                   size=1024)
+        queries.delete_recursive(folder_id=current_folder.pk)
+        self.assertFalse(models.Folder.objects.exists())
+        self.assertFalse(models.File.objects.exists())
+
+
+class TestFolderTree(TestCase):
+    """TestCase class for testing materialized path of Folder model."""
+
+    def setUp(self) -> None:
+        """Set default values for each test."""
+        self.user = User.objects.create(username='test_user')
+        self.root = models.Folder.objects.create(title='root', owner=self.user, parent=None)
+        self.child = models.Folder.objects.create(title='child', owner=self.user, parent=self.root)
+        self.grandchild = models.Folder.objects.create(title='grandchild', owner=self.user, parent=self.child)
+        self.other = models.Folder.objects.create(title='other', owner=self.user, parent=None)
+
+    def test_path(self):
+        """Test path contains pks of all ancestors."""
+        self.assertEqual(self.root.path, f'{self.root.pk}/')
+        self.assertEqual(self.grandchild.path, f'{self.root.pk}/{self.child.pk}/{self.grandchild.pk}/')
+
+    def test_descendants(self):
+        """Test descendants return the whole subtree."""
+        self.assertEqual(set(self.root.descendants()), {self.child, self.grandchild})
+        self.assertFalse(self.other.descendants().exists())
+
+    def test_ancestors(self):
+        """Test ancestors are ordered from the root."""
+        self.assertEqual(list(self.grandchild.ancestors()), [self.root, self.child])
+        self.assertFalse(self.root.ancestors().exists())
+
+    def test_rename_keeps_path(self):
+        """Test rename does not change path."""
+        path = self.child.path
+        self.child.title = 'renamed'
+        self.child.save()
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.path, path)
+
+    def test_move_updates_subtree(self):
+        """Test move updates paths of all nested folders."""
+        self.child.parent = self.other
+        self.child.save()
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.path, f'{self.other.pk}/{self.child.pk}/{self.grandchild.pk}/')
+        self.assertEqual(set(self.other.descendants()), {self.child, self.grandchild})
+        self.assertFalse(self.root.descendants().exists())
+
+    def test_stale_instance_keeps_path(self):
+        """Test saving an instance loaded before its parent moved keeps the new path."""
+        stale_grandchild = models.Folder.objects.get(pk=self.grandchild.pk)
+        self.child.parent = self.other
+        self.child.save()
+
+        stale_grandchild.title = 'renamed'
+        stale_grandchild.save()
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.path, f'{self.other.pk}/{self.child.pk}/{self.grandchild.pk}/')
+
+        stale_grandchild.parent = self.root
+        stale_grandchild.save()
+        self.assertEqual(stale_grandchild.path, f'{self.root.pk}/{self.grandchild.pk}/')
+        self.assertFalse(self.other.descendants().exclude(pk=self.child.pk).exists())
+
+
+class TestAssetsList(TestCase):
+    """TestCase class for testing pages of assets list query."""
+
+    def setUp(self) -> None:
+        """Set default values for each test."""
+        self.user = User.objects.create(username='test_user')
+        self.parent = models.Folder.objects.create(title='parent', owner=self.user, parent=None)
+        for title in ('b_folder', 'a_folder'):
+            models.Folder.objects.create(title=title, owner=self.user, parent=self.parent)
+        for title in ('b.txt', 'a.txt', 'c.txt'):
+            models.File.objects.create(title=title,
+                                       owner=self.user,
+                                       folder=self.parent,
+                                       relative_key=f'users/{self.user.pk}/assets/{uuid.uuid4()}',
+                                       extension='.txt',
+                                       size=1024)
+
+    def get_titles(self, limit):
+        """Auxiliary func collecting titles of all pages."""
+        titles, after = [], None
+        while True:
+            rows = queries.get_assets_list(str(self.parent.uuid), self.user.pk, after, limit)
+            titles.extend(row['title'] for row in rows)
+            if len(rows) < limit:
+                return titles
+            after = (rows[-1]['is_folder'], rows[-1]['title'], rows[-1]['id'])
+
+    def test_whole_list(self):
+        """Test list without limit returns folders first in stable order."""
+        rows = queries.get_assets_list(str(self.parent.uuid), self.user.pk)
+        self.assertEqual([row['title'] for row in rows], ['a_folder', 'b_folder', 'a.txt', 'b.txt', 'c.txt'])
+
+    def test_pages(self):
+        """Test pages cover the whole list without gaps and duplicates."""
+        for limit in (1, 2, 3):
+            self.assertEqual(self.get_titles(limit), ['a_folder', 'b_folder', 'a.txt', 'b.txt', 'c.txt'])
+
+    def test_root_page(self):
+        """Test root page lists only top level assets."""
+        rows = queries.get_assets_list(None, self.user.pk, None, 10)
+        self.assertEqual([row['title'] for row in rows], ['parent'])
+
+
+class TestSharedTableModel(TestCase):
+    """TestCase class for testing permission flags of SharedTable model."""
+
+    def setUp(self) -> None:
+        """Set default values for each test."""
+        self.user = User.objects.create(username='test_user')
+        file = models.File.objects.create(title='test_file.txt',
+                                          owner=self.user,
+                                          relative_key=f'users/{self.user.pk}/assets/{uuid.uuid4()}',
+                                          extension='.txt',
+                                          size=1024)
+        self.read = models.Permissions.objects.create(title='Download', name=models.Permissions.READ_ONLY)
+        self.delete = models.Permissions.objects.create(title='Delete', name=models.Permissions.DELETE_ONLY)
+        self.share = models.SharedTable.objects.create(
+            file=file,
+            user=User.objects.create(username='test_user_2'),
+            expired='2100-01-01 00:00Z',
+            permission_flags=models.Permissions.get_flags([self.read, self.delete])
+        )
+
+    def test_has_permission(self):
+        """Test flags grant only selected permissions."""
+        self.assertTrue(self.share.can_read)
+        self.assertFalse(self.share.can_rename)
+        self.assertTrue(self.share.can_delete)
+
+    def test_str_without_queries(self):
+        """Test string of a share does not load its file and user."""
+        share = models.SharedTable.objects.get(pk=self.share.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(share), f'{share.file_id}: {share.user_id}')
+
+    def test_invalidate_without_queries(self):
+        """Test cached permissions of a share are dropped without loading its file."""
+        share = models.SharedTable.objects.get(pk=self.share.pk)
+        with self.assertNumQueries(0):
+            signals.invalidate_share(models.SharedTable, share)
+
+    def test_with_permission(self):
+        """Test shares are filtered by flags in SQL."""
+        shares = models.SharedTable.objects.active()
+        self.assertTrue(shares.with_permission(models.Permissions.DELETE_ONLY).exists())
+        self.assertFalse(shares.with_permission(models.Permissions.RENAME_ONLY).exists())
+
+
+class TestFolderStats(TestCase):
+    """TestCase class for testing size and count aggregates of Folder model."""
+
+    def setUp(self) -> None:
+        """Set default values for each test."""
+        self.user = User.objects.create(username='test_user')
+        self.root = models.Folder.objects.create(title='root', owner=self.user, parent=None)
+        self.child = models.Folder.objects.create(title='child', owner=self.user, parent=self.root)
+        self.other = models.Folder.objects.create(title='other', owner=self.user, parent=None)
+        self.file = self.create_file('file.txt', self.child, 100)
+
+    def create_file(self, title, folder, size, is_uploaded=True):
+        """Auxiliary func for tests."""
+        return models.File.objects.create(title=title,
+                                          owner=self.user,
+                                          folder=folder,
+                                          relative_key=f'users/{self.user.pk}/assets/{uuid.uuid4()}',
+                                          extension='.txt',
+                                          size=size,
+                                          is_uploaded=is_uploaded)
+
+    def assertStats(self, folder, total_size, file_count):
+        """Check aggregates of the folder in DB."""
+        folder.refresh_from_db()
+        self.assertEqual((folder.total_size, folder.file_count), (total_size, file_count))
+
+    def test_create_file(self):
+        """Test file is added to all ancestors."""
+        self.create_file('file_2.txt', self.child, 50)
+        self.assertStats(self.child, 150, 2)
+        self.assertStats(self.root, 150, 2)
+        self.assertStats(self.other, 0, 0)
+
+    def test_upload_file(self):
+        """Test reserved file is counted after upload."""
+        reserved = self.create_file('file_2.txt', self.child, 50, is_uploaded=False)
+        self.assertStats(self.root, 100, 1)
+
+        reserved = models.File.objects.only('id', 'title').get(pk=reserved.pk)
+        reserved.is_uploaded = True
+        reserved.save()
+        self.assertStats(self.root, 150, 2)
+
+    def test_move_and_delete_file(self):
+        """Test file is moved between ancestors and removed on delete."""
+        self.file.folder = self.other
+        self.file.save()
+        self.assertStats(self.root, 0, 0)
+        self.assertStats(self.other, 100, 1)
+
+        queries.delete_file(self.file.uuid)
+        self.assertStats(self.other, 0, 0)
+
+    def test_move_folder(self):
+        """Test folder aggregates are moved with the folder."""
+        self.child.parent = self.other
+        self.child.save()
+        self.assertStats(self.root, 0, 0)
+        self.assertStats(self.other, 100, 1)
+        self.assertStats(self.child, 100, 1)
+
+    def test_delete_folder_tree(self):
+        """Test ancestors lose aggregates of deleted subtree."""
+        queries.delete_folder_tree(self.child.path)
+        self.assertStats(self.root, 0, 0)
+
+    def test_reconcile(self):
+        """Test reconciliation fixes drifted aggregates."""
+        models.Folder.objects.update(total_size=1, file_count=1)
+        self.assertEqual(queries.reconcile_folder_stats(), 3)
+        self.assertStats(self.root, 100, 1)
+        self.assertStats(self.child, 100, 1)
+        self.assertStats(self.other, 0, 0)
+        self.assertEqual(queries.reconcile_folder_stats(), 0)
+
+
+class TestStorageUsage(TestCase):
+    """TestCase class for testing StorageUsage model."""
+
+    def setUp(self) -> None:
+        """Set default values for each test."""
+        self.user = User.objects.create(username='test_user')
+        self.folder = models.Folder.objects.create(title='folder', owner=self.user, parent=None)
+
+    def create_file(self, title, folder, size):
+        """Auxiliary func for tests."""
+        return models.File.objects.create(title=title,
+                                          owner=self.user,
+                                          folder=folder,
+                                          relative_key=f'users/{self.user.pk}/assets/{uuid.uuid4()}',
+                                          extension='.txt',
+                                          size=size,
+                                          is_uploaded=False)
+
+    def assertUsage(self, used_size, file_count):
+        """Check storage usage of the user in DB."""
+        usage = models.StorageUsage.objects.get(user=self.user)
+        self.assertEqual((usage.used_size, usage.file_count), (used_size, file_count))
+
+    def test_create_update_delete(self):
+        """Test usage follows reserved, uploaded and deleted files."""
+        file = self.create_file('file.txt', None, 100)
+        self.create_file('file_2.txt', None, 50)
+        self.assertUsage(150, 2)
+
+        file.size = 80
+        file.is_uploaded = True
+        file.save()
+        self.assertUsage(130, 2)
+
+        queries.delete_file(file.uuid)
+        self.assertUsage(50, 1)
+
+    def test_delete_folder_tree(self):
+        """Test files of deleted folders release usage."""
+        self.create_file('file.txt', self.folder, 100)
+        self.create_file('file_2.txt', None, 50)
+        queries.delete_folder_tree(self.folder.path)
+        self.assertUsage(50, 1)
+
+
+@override_settings(USER_STORAGE_QUOTA=150)
+class TestStorageQuota(TransactionTestCase):
+    """TestCase class for testing storage quota under concurrent uploads."""
+
+    def setUp(self) -> None:
+        """Set default values for each test."""
+        self.user = User.objects.create(username='test_user')
+
+    def reserve(self, title, size):
+        """Auxiliary func for tests."""
+        with transaction.atomic():
+            if not validators.validate_storage_quota(self.user, size):
+                return False
+            models.File.objects.create(title=title,
+                                       owner=self.user,
+                                       relative_key=f'users/{self.user.pk}/assets/{uuid.uuid4()}',
+                                       size=size,
+                                       is_uploaded=False)
+            return True
+
+    def test_concurrent_reservations(self):
+        """Test the second upload waits for the first one and sees its usage."""
+        results = []
+
+        def reserve_in_thread():
+            try:
+                results.append(self.reserve('file_2.txt', 100))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            self.assertTrue(validators.validate_storage_quota(self.user, 100))
+            thread = threading.Thread(target=reserve_in_thread)
+            thread.start()
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+            models.File.objects.create(title='file.txt',
+                                       owner=self.user,
+                                       relative_key=f'users/{self.user.pk}/assets/{uuid.uuid4()}',
+                                       size=100,
+                                       is_uploaded=False)
+        thread.join()
+
+        self.assertEqual(results, [False])
+        self.assertEqual(models.StorageUsage.objects.get(user=self.user).used_size, 100)
+
+
+class TestFileExtensionStats(TestCase):
+    """TestCase class for testing FileExtensionStats model."""
+
+    def setUp(self) -> None:
+        """Set default values for each test."""
+        self.user = User.objects.create(username='test_user')
+        self.folder = models.Folder.objects.create(title='folder', owner=self.user, parent=None)
+
+    def create_file(self, title, folder, size, extension='.txt', is_uploaded=True):
+        """Auxiliary func for tests."""
+        return models.File.objects.create(title=title,
+                                          owner=self.user,
+                                          folder=folder,
+                                          relative_key=f'users/{self.user.pk}/assets/{uuid.uuid4()}',
+                                          extension=extension,
+                                          size=size,
+                                          is_uploaded=is_uploaded)
+
+    def get_stats(self):
+        """Return count and size by extension of the user in DB."""
+        return {stats.extension: (stats.count, stats.total_bytes)
+                for stats in models.FileExtensionStats.objects.filter(owner=self.user, count__gt=0)}
+
+    def test_create_update_delete(self):
+        """Test statistics follow uploaded, renamed and deleted files."""
+        file = self.create_file('file.txt', None, 100, is_uploaded=False)
+        self.create_file('file_2.txt', None, 50)
+        self.create_file('file', None, 10, extension=None)
+        self.assertEqual(self.get_stats(), {'.txt': (1, 50), '': (1, 10)})
+
+        file.is_uploaded = True
+        file.save()
+        self.assertEqual(self.get_stats(), {'.txt': (2, 150), '': (1, 10)})
+
+        file.extension = '.jpg'
+        file.save()
+        self.assertEqual(self.get_stats(), {'.txt': (1, 50), '.jpg': (1, 100), '': (1, 10)})
+
+        queries.delete_file(file.uuid)
+        self.assertEqual(self.get_stats(), {'.txt': (1, 50), '': (1, 10)})
+
+    def test_delete_folder_tree(self):
+        """Test files of deleted folders are removed from statistics."""
+        self.create_file('file.txt', self.folder, 100)
+        self.create_file('file_2.txt', None, 50)
+        self.create_file('file.jpg', self.folder, 20, extension='.jpg', is_uploaded=False)
+        queries.delete_folder_tree(self.folder.path)
+        self.assertEqual(self.get_stats(), {'.txt': (1, 50)})
+
+    def test_rebuild(self):
+        """Test rebuild restores drifted statistics."""
+        self.create_file('file.txt', None, 100)
+        self.create_file('file.jpg', None, 20, extension='.jpg', is_uploaded=False)
+        models.FileExtensionStats.objects.update(count=5, total_bytes=0)
+        models.FileExtensionStats.objects.create(owner=self.user, extension='.exe', count=1, total_bytes=1)
+
+        self.assertEqual(queries.rebuild_extension_stats(), 1)
+        self.assertEqual(self.get_stats(), {'.txt': (1, 100)})
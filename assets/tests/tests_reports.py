@@ -0,0 +1,101 @@
+"""Tests for reports generated by Celery worker."""
+import os
+from unittest.mock import Mock, patch
+import uuid
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from assets import models
+from assets.tests.utils import import_worker_module, WorkerDatabaseMixin
+
+queries = import_worker_module('queries')
+utils = import_worker_module('utils')
+
+
+class TestReportRows(WorkerDatabaseMixin, TransactionTestCase):
+    """TestCase class for testing rows of report sheets read by the worker."""
+
+    # The worker connects in a session of other time zone.
+    worker_environ = {'PGTZ': 'Asia/Tokyo'}
+
+    def setUp(self) -> None:
+        """Set default values for each test."""
+        super().setUp()
+        self.user = User.objects.create(username='test_user')
+        self.other_user = User.objects.create(username='other_user')
+        folder = models.Folder.objects.create(title='photos', owner=self.user)
+        models.Folder.objects.create(title='empty', owner=self.user)
+        for title, folder_obj, size, created_at in (
+                ('a.jpg', folder, 2048, '2026-01-31 23:30+00'),
+                ('b.jpg', folder, 10, '2026-03-01 00:30+00'),
+                ('c.txt', None, 5 * 1024 ** 2, None),
+                ('d.txt', None, 100, '2026-03-15 12:00+00')):
+            file = models.File.objects.create(title=title,
+                                              owner=self.user,
+                                              folder=folder_obj,
+                                              relative_key=f'users/{self.user.pk}/assets/{uuid.uuid4()}',
+                                              extension=os.path.splitext(title)[1],
+                                              size=size)
+            models.File.objects.filter(pk=file.pk).update(created_at=created_at)
+
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE assets_reportsubscribers (schedule_id integer, user_id integer)')
+            cursor.execute('INSERT INTO assets_reportsubscribers VALUES (1, %s), (2, %s)',
+                           [self.user.pk, self.other_user.pk])
+
+    def tearDown(self) -> None:
+        """Drop the subscribers table."""
+        super().tearDown()
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE assets_reportsubscribers')
+
+    def test_rows(self):
+        """Test rows have all columns and are ordered by user, sheet and position."""
+        rows = list(queries.iter_report_rows(1, [self.user.pk, self.other_user.pk]))
+        self.assertTrue(all(len(row) == 7 for row in rows))
+        self.assertEqual([row[:3] for row in rows], sorted(row[:3] for row in rows))
+        self.assertEqual({row[0] for row in rows}, {self.user.pk})
+
+        sheets = {}
+        for _, sheet, _, *values in rows:
+            sheets.setdefault(sheet, []).append(values)
+        self.assertEqual(sheets[0], [['.jpg', 2, None, None], ['.txt', 2, None, None]])
+        self.assertEqual(sheets[1], [['.txt', 5 * 1024 ** 2 + 100, None, None], ['.jpg', 2058, None, None]])
+        self.assertEqual(sheets[2], [['< 1 KB', 2, 110, None], ['1 KB - 1 MB', 1, 2048, None],
+                                     ['1 MB - 100 MB', 1, 5 * 1024 ** 2, None]])
+        self.assertEqual([values[0] for values in sheets[3]], ['c.txt', 'a.jpg', 'd.txt', 'b.jpg'])
+        self.assertEqual(sheets[4], [['photos', 2058, 2, None], ['empty', 0, 0, None]])
+        self.assertEqual(sheets[5], [['Unknown', 1, 5 * 1024 ** 2, 5 * 1024 ** 2],
+                                     ['2026-01', 1, 2048, 5 * 1024 ** 2 + 2048],
+                                     ['2026-03', 2, 110, 5 * 1024 ** 2 + 2158]])
+
+
+class TestReportExcelFile(SimpleTestCase):
+    """TestCase class for testing excel file of the report."""
+
+    @patch('utils.upload_excel_to_bucket')
+    @patch('utils.xlsxwriter.Workbook')
+    def test_sheets(self, mock_workbook, mock_upload):
+        """Test rows are written to their sheets under the header without unused values."""
+        worksheets = [Mock() for _ in utils.REPORT_SHEETS]
+        mock_workbook.return_value.add_worksheet.side_effect = worksheets
+        rows = [(0, 1, '.jpg', 2, None, None),
+                (4, 1, 'photos', 2058, 2, None),
+                (5, 1, '2026-01', 1, 2048, 2048),
+                (5, 2, '2026-03', 2, 110, 2158)]
+
+        utils.create_excel_file(rows, 5)
+
+        titles = [call.args[0] for call in mock_workbook.return_value.add_worksheet.call_args_list]
+        self.assertEqual(titles, [title for title, _ in utils.REPORT_SHEETS])
+        self.assertEqual([call.kwargs for call in worksheets[0].write_row.call_args_list],
+                         [{'row': 0, 'col': 0, 'data': ('Extension', 'Files')},
+                          {'row': 1, 'col': 0, 'data': ['.jpg', 2]}])
+        self.assertEqual(worksheets[4].write_row.call_args.kwargs['data'], ['photos', 2058, 2])
+        self.assertEqual([call.kwargs for call in worksheets[5].write_row.call_args_list[1:]],
+                         [{'row': 1, 'col': 0, 'data': ['2026-01', 1, 2048, 2048]},
+                          {'row': 2, 'col': 0, 'data': ['2026-03', 2, 110, 2158]}])
+        self.assertEqual(worksheets[1].write_row.call_count, 1)
+        self.assertEqual(mock_upload.call_args.args[1], 5)
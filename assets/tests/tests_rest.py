@@ -1,13 +1,20 @@
+import os
 from tempfile import TemporaryFile
 from unittest.mock import patch
 
 import uuid
+from botocore.exceptions import ClientError
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 
-from assets.models import Folder, File, Permissions, SharedTable
+from assets.db import queries
+from assets.pagination import encode_cursor
+from assets.models import Folder, File, Permissions, SharedTable, StorageUsage
 
 
 class FolderCreateTests(APITestCase):
@@ -168,9 +175,35 @@ class FolderListTests(APITestCase):
         response = self.client.get(reverse('assets-api-folders'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(
-            {'title': 'test_folder_1', 'parent': None, 'uuid': str(self.folder_1.uuid)} in response.json())
+            {'title': 'test_folder_1', 'parent': None, 'uuid': str(self.folder_1.uuid)} in response.json()['results'])
         self.assertTrue(
-            {'title': 'test_folder_3', 'parent': None, 'uuid': str(self.folder_3.uuid)} not in response.json())
+            {'title': 'test_folder_3', 'parent': None, 'uuid': str(self.folder_3.uuid)} not in response.json()['results'])
+
+    def test_folder_list_pages(self):
+        child = Folder.objects.create(title='child', owner=self.test_user, parent=self.folder_2)
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.get(reverse('assets-api-folders'), {'page_size': 2})
+        self.assertEqual([folder['title'] for folder in response.data['results']], ['child', 'test_folder_1'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([folder['title'] for folder in response.data['results']], ['test_folder_2'])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(reverse('assets-api-folders'), {'parent': str(self.folder_2.uuid)})
+        self.assertEqual(response.data['results'], [{'title': 'child', 'parent': 'test_folder_2',
+                                                     'uuid': str(child.uuid)}])
+
+    def test_folder_list_invalid_cursor(self):
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.get(reverse('assets-api-folders'), {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_folder_list_cursor_wrong_values(self):
+        self.client.force_authenticate(user=self.test_user)
+        for values in ({'id': 1}, [None, 'a'], [None, 'a', 'b'], ['a', 'b', 1], [None, 'a', True],
+                       [None, 'a', 2 ** 63], [None, 'a\x00', 1], [None, ['a'], 1]):
+            response = self.client.get(reverse('assets-api-folders'), {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
 
 
 class ShareListTests(APITestCase):
@@ -229,7 +262,8 @@ class ShareListTests(APITestCase):
             user=self.test_user_2,
             expired='2022-01-22 10:05',
         )
-        self.shared_table.permissions.set([self.perm_read, self.perm_rename])
+        self.shared_table.permission_flags = self.perm_read.flag | self.perm_rename.flag
+        self.shared_table.save()
 
     def test_share_list_count(self):
         self.client.force_authenticate(self.test_user)
@@ -435,14 +469,16 @@ class ShareUpdateDestroyTests(APITestCase):
             user=self.test_user_2,
             expired='2022-01-22 10:05',
         )
-        self.shared_table.permissions.set([self.perm_read, self.perm_rename])
+        self.shared_table.permission_flags = self.perm_read.flag | self.perm_rename.flag
+        self.shared_table.save()
 
         self.shared_table_2 = SharedTable.objects.create(
             file=self.file_3,
             user=self.test_user,
             expired='2022-01-22 10:05',
         )
-        self.shared_table.permissions.set([self.perm_read, self.perm_rename])
+        self.shared_table.permission_flags = self.perm_read.flag | self.perm_rename.flag
+        self.shared_table.save()
 
     def test_update_share_correct_user(self):
         self.client.force_authenticate(user=self.test_user)
@@ -547,16 +583,18 @@ class ShareFileRetrieveUpdateDestroyTests(APITestCase):
         self.shared_table = SharedTable.objects.create(
             file=self.file_1,
             user=self.test_user_2,
-            expired='2022-01-22 10:05',
+            expired='2100-01-01 00:00Z',
         )
-        self.shared_table.permissions.set([self.perm_delete])
+        self.shared_table.permission_flags = self.perm_delete.flag
+        self.shared_table.save()
 
         self.shared_table_2 = SharedTable.objects.create(
             file=self.file_2,
             user=self.test_user_2,
-            expired='2022-01-22 10:05',
+            expired='2100-01-01 00:00Z',
         )
-        self.shared_table_2.permissions.set([self.perm_rename])
+        self.shared_table_2.permission_flags = self.perm_rename.flag
+        self.shared_table_2.save()
 
     def test_update_file_correct(self):
         self.client.force_authenticate(user=self.test_user_2)
@@ -616,6 +654,82 @@ class ShareFileRetrieveUpdateDestroyTests(APITestCase):
         response = self.client.delete(f'/api/assets/files/shared-with-me/{self.file_1.relative_key}/')
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_expired_share_denied(self):
+        self.shared_table_2.expired = '2000-01-01 00:00Z'
+        self.shared_table_2.save()
+        self.client.force_authenticate(user=self.test_user_2)
+        response = self.client.put(
+            f'/api/assets/files/shared-with-me/{self.file_2.relative_key}/',
+            {'title': 'newtitle'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get('/api/assets/files/shared-with-me/')
+        self.assertEqual(len(response.data), 1)
+
+    def test_share_again_after_expiry(self):
+        self.shared_table.expired = '2000-01-01 00:00Z'
+        self.shared_table.save()
+        self.client.force_authenticate(user=self.test_user)
+        payload = {
+            'file': self.file_1.pk,
+            'email': self.test_user_2.email,
+            'permissions': [self.perm_rename.pk],
+            'expired': '2100-01-01 00:00'
+        }
+        response = self.client.post(reverse('assets-share-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SharedTable.objects.get(file=self.file_1).permission_flags, self.perm_rename.flag)
+
+    @patch('assets.aws.s3.get_presigned_url', return_value='url')
+    def test_retrieve_file_single_query(self, mock_get_url):
+        self.shared_table.permission_flags |= Permissions.FLAGS[Permissions.READ_ONLY]
+        self.shared_table.save()
+        self.client.force_authenticate(user=self.test_user_2)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/assets/files/shared-with-me/{self.file_1.uuid}/')
+        self.assertEqual(response.data, {'url': 'url'})
+
+    def test_permission_checked_in_query(self):
+        self.client.force_authenticate(user=self.test_user_2)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/assets/files/shared-with-me/{self.file_1.uuid}/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(len(context), 1)
+        flag = Permissions.FLAGS[Permissions.READ_ONLY]
+        self.assertIn(f'"assets_sharedtable"."permission_flags" & {flag}', context.captured_queries[0]['sql'])
+
+    @patch('assets.aws.s3.get_presigned_url', return_value='url')
+    def test_cached_permissions_invalidated(self, mock_get_url):
+        self.shared_table.permission_flags |= Permissions.FLAGS[Permissions.READ_ONLY]
+        self.shared_table.save()
+        self.client.force_authenticate(user=self.test_user_2)
+        url = f'/api/assets/files/shared-with-me/{self.file_1.uuid}/'
+        with override_settings(SHARED_FILE_CACHE_TIMEOUT=60):
+            self.client.get(url)
+            with self.assertNumQueries(1):
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+            self.shared_table.permission_flags = 0
+            self.shared_table.save()
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+    @patch('assets.aws.s3.get_presigned_url', return_value='url')
+    def test_cached_permissions_of_deleted_folder(self, mock_get_url):
+        folder = Folder.objects.create(title='folder', owner=self.test_user)
+        self.file_1.folder = folder
+        self.file_1.save()
+        self.shared_table.permission_flags |= Permissions.FLAGS[Permissions.READ_ONLY]
+        self.shared_table.save()
+        self.client.force_authenticate(user=self.test_user_2)
+        url = f'/api/assets/files/shared-with-me/{self.file_1.uuid}/'
+        with override_settings(SHARED_FILE_CACHE_TIMEOUT=60):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+            queries.delete_folder_tree(folder.path)
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
 
 class ThumbnailCreateTest(APITestCase):
 
@@ -690,3 +804,437 @@ class ThumbnailCreateTest(APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FileUploadTests(APITestCase):
+
+    def setUp(self):
+        self.test_user = User.objects.create_user(username='test_user',
+                                                  password='test',
+                                                  email='test@test.test')
+
+        self.test_user_2 = User.objects.create_user(username='test_user_2',
+                                                    password='test',
+                                                    email='test_2@test.test')
+        self.client = APIClient()
+
+        self.folder = Folder.objects.create(
+            title='test_folder_1',
+            owner=self.test_user_2,
+            parent=None
+        )
+
+    @patch('assets.aws.s3.create_presigned_post')
+    def test_upload_create_success(self, patch_api):
+        patch_api.return_value = {'url': 'https://bucket.s3.amazonaws.com/', 'fields': {'key': 'key'}}
+        self.client.force_authenticate(user=self.test_user)
+        payload = {
+            'title': 'image.jpg',
+            'size': 1024,
+            'content_type': 'image/jpeg'
+        }
+        response = self.client.post(reverse('assets-file-upload'), payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['url'], 'https://bucket.s3.amazonaws.com/')
+        file = File.objects.get(uuid=response.data['uuid'])
+        self.assertFalse(file.is_uploaded)
+        self.assertEqual(file.extension, '.jpg')
+        self.assertEqual(patch_api.call_args.args, (file.relative_key, '.jpg', 'image/jpeg', 1024))
+
+    def test_upload_create_too_large(self):
+        self.client.force_authenticate(user=self.test_user)
+        payload = {
+            'title': 'image.jpg',
+            'size': 10 * 1024 ** 4,
+        }
+        response = self.client.post(reverse('assets-file-upload'), payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(File.objects.count(), 0)
+
+    @override_settings(USER_STORAGE_QUOTA=2048)
+    @patch('assets.aws.s3.create_presigned_post')
+    def test_upload_create_quota_exceeded(self, patch_api):
+        patch_api.return_value = {'url': 'https://bucket.s3.amazonaws.com/', 'fields': {'key': 'key'}}
+        self.client.force_authenticate(user=self.test_user)
+        payload = {
+            'title': 'image.jpg',
+            'size': 1024,
+        }
+        response = self.client.post(reverse('assets-file-upload'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        payload['title'] = 'image_2.jpg'
+        payload['size'] = 1025
+        response = self.client.post(reverse('assets-file-upload'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(File.objects.count(), 1)
+
+    @override_settings(USER_STORAGE_QUOTA=2048)
+    def test_storage_usage(self):
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.get(reverse('assets-usage'))
+        self.assertEqual(response.data, {'used_size': 0, 'file_count': 0, 'quota': 2048})
+
+        File.objects.create(title='test_file', owner=self.test_user, relative_key=str(uuid.uuid4()),
+                            extension='.txt', size=1024)
+        response = self.client.get(reverse('assets-usage'))
+        self.assertEqual(response.data, {'used_size': 1024, 'file_count': 1, 'quota': 2048})
+
+    def test_upload_create_foreign_folder(self):
+        self.client.force_authenticate(user=self.test_user)
+        payload = {
+            'title': 'image.jpg',
+            'size': 1024,
+            'folder': str(self.folder.uuid)
+        }
+        response = self.client.post(reverse('assets-file-upload'), payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(File.objects.count(), 0)
+
+    @patch('assets.aws.s3.get_object_size')
+    def test_upload_complete_success(self, patch_api):
+        patch_api.return_value = 2048
+        file = File.objects.create(title='image.jpg',
+                                   owner=self.test_user,
+                                   size=1024,
+                                   relative_key=f'users/{self.test_user.pk}/assets/{uuid.uuid4()}',
+                                   is_uploaded=False)
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.post(reverse('assets-file-upload-complete', args=(file.uuid,)))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        file.refresh_from_db()
+        self.assertTrue(file.is_uploaded)
+        self.assertEqual(file.size, 2048)
+        self.assertEqual(file.extension, '.jpg')
+
+    @patch('assets.aws.s3.get_object_size')
+    def test_upload_complete_not_uploaded(self, patch_api):
+        patch_api.return_value = None
+        file = File.objects.create(title='image.jpg',
+                                   owner=self.test_user,
+                                   size=1024,
+                                   relative_key=f'users/{self.test_user.pk}/assets/{uuid.uuid4()}',
+                                   is_uploaded=False)
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.post(reverse('assets-file-upload-complete', args=(file.uuid,)))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        file.refresh_from_db()
+        self.assertFalse(file.is_uploaded)
+
+    @patch('assets.aws.s3.delete_keys')
+    def test_upload_abort_success(self, patch_api):
+        file = File.objects.create(title='image.jpg',
+                                   owner=self.test_user,
+                                   size=1024,
+                                   relative_key=f'users/{self.test_user.pk}/assets/{uuid.uuid4()}',
+                                   is_uploaded=False)
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.delete(reverse('assets-file-upload-abort', args=(file.uuid,)))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        patch_api.assert_called_once_with([file.relative_key])
+        self.assertFalse(File.objects.filter(uuid=file.uuid).exists())
+
+    def test_upload_abort_uploaded(self):
+        file = File.objects.create(title='image.jpg',
+                                   owner=self.test_user,
+                                   size=1024,
+                                   relative_key=f'users/{self.test_user.pk}/assets/{uuid.uuid4()}',
+                                   is_uploaded=True)
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.delete(reverse('assets-file-upload-abort', args=(file.uuid,)))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(File.objects.filter(uuid=file.uuid).exists())
+
+    def test_upload_complete_wrong_user(self):
+        file = File.objects.create(title='image.jpg',
+                                   owner=self.test_user,
+                                   size=1024,
+                                   relative_key=f'users/{self.test_user.pk}/assets/{uuid.uuid4()}',
+                                   is_uploaded=False)
+        self.client.force_authenticate(user=self.test_user_2)
+        response = self.client.post(reverse('assets-file-upload-complete', args=(file.uuid,)))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MultipartUploadTests(APITestCase):
+
+    def setUp(self):
+        self.test_user = User.objects.create_user(username='test_user',
+                                                  password='test',
+                                                  email='test@test.test')
+
+        self.test_user_2 = User.objects.create_user(username='test_user_2',
+                                                    password='test',
+                                                    email='test_2@test.test')
+        self.client = APIClient()
+
+        self.file = File.objects.create(title='video.mp4',
+                                        owner=self.test_user,
+                                        size=10 * 1024 ** 2,
+                                        relative_key=f'users/{self.test_user.pk}/assets/{uuid.uuid4()}',
+                                        is_uploaded=False,
+                                        upload_id='upload-id')
+        self.parts = [{'part_number': 1, 'etag': '"etag-1"', 'size': 5 * 1024 ** 2},
+                      {'part_number': 2, 'etag': '"etag-2"', 'size': 1024}]
+
+    @patch('assets.aws.s3.create_multipart_upload')
+    def test_multipart_create_success(self, patch_api):
+        patch_api.return_value = 'new-upload-id'
+        self.client.force_authenticate(user=self.test_user)
+        payload = {
+            'title': 'movie.mkv',
+            'size': 5 * 1024 ** 3,
+            'content_type': 'video/x-matroska'
+        }
+        response = self.client.post(reverse('assets-multipart'), payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        file = File.objects.get(uuid=response.data['uuid'])
+        self.assertFalse(file.is_uploaded)
+        self.assertEqual(file.upload_id, 'new-upload-id')
+
+    @patch('assets.aws.s3.get_upload_part_urls')
+    def test_multipart_part_urls(self, patch_api):
+        patch_api.return_value = {1: 'url-1', 2: 'url-2'}
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.post(reverse('assets-multipart-parts', args=(self.file.uuid,)),
+                                    {'part_numbers': [1, 2]},
+                                    format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['urls'], {1: 'url-1', 2: 'url-2'})
+        self.assertEqual(patch_api.call_args.args, (self.file.relative_key, 'upload-id', [1, 2]))
+
+    def test_multipart_part_urls_wrong_part_number(self):
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.post(reverse('assets-multipart-parts', args=(self.file.uuid,)),
+                                    {'part_numbers': [0, 10001]},
+                                    format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('assets.aws.s3.list_parts')
+    def test_multipart_list_parts(self, patch_api):
+        patch_api.return_value = self.parts
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.get(reverse('assets-multipart-parts', args=(self.file.uuid,)))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['parts'], self.parts)
+
+    def test_multipart_wrong_user(self):
+        self.client.force_authenticate(user=self.test_user_2)
+        response = self.client.get(reverse('assets-multipart-parts', args=(self.file.uuid,)))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch('assets.aws.s3.complete_multipart_upload')
+    @patch('assets.aws.s3.list_parts')
+    def test_multipart_complete(self, patch_list, patch_complete):
+        patch_list.return_value = self.parts
+        patch_complete.return_value = None
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.post(reverse('assets-multipart-complete', args=(self.file.uuid,)))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(patch_complete.call_args.args, (self.file.relative_key, 'upload-id', self.parts))
+        self.file.refresh_from_db()
+        self.assertTrue(self.file.is_uploaded)
+        self.assertIsNone(self.file.upload_id)
+        self.assertEqual(self.file.size, 5 * 1024 ** 2 + 1024)
+
+    @patch('assets.aws.s3.abort_multipart_upload')
+    @patch('assets.aws.s3.complete_multipart_upload')
+    @patch('assets.aws.s3.list_parts')
+    def test_multipart_complete_exceeds_reserved_size(self, patch_list, patch_complete, patch_abort):
+        patch_list.return_value = self.parts + [{'part_number': 3, 'etag': '"etag-3"', 'size': 5 * 1024 ** 3}]
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.post(reverse('assets-multipart-complete', args=(self.file.uuid,)))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        patch_complete.assert_not_called()
+        self.assertEqual(patch_abort.call_args.args, (self.file.relative_key, 'upload-id'))
+        self.assertFalse(File.objects.filter(pk=self.file.pk).exists())
+
+    @patch('assets.aws.s3.get_client')
+    @patch('assets.aws.s3.list_parts')
+    def test_multipart_complete_client_error(self, patch_list, patch_client):
+        patch_list.return_value = self.parts
+        self.client.force_authenticate(user=self.test_user)
+        url = reverse('assets-multipart-complete', args=(self.file.uuid,))
+
+        patch_client.return_value.complete_multipart_upload.side_effect = ClientError(
+            {'Error': {'Code': 'EntityTooSmall', 'Message': 'Part is too small.'}}, 'CompleteMultipartUpload')
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.file.refresh_from_db()
+        self.assertFalse(self.file.is_uploaded)
+        self.assertEqual(self.file.upload_id, 'upload-id')
+
+        patch_client.return_value.complete_multipart_upload.side_effect = ClientError(
+            {'Error': {'Code': 'NoSuchUpload', 'Message': 'Upload does not exist.'}}, 'CompleteMultipartUpload')
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(File.objects.filter(pk=self.file.pk).exists())
+
+    @patch('assets.aws.s3.list_parts')
+    def test_multipart_complete_without_parts(self, patch_api):
+        patch_api.return_value = []
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.post(reverse('assets-multipart-complete', args=(self.file.uuid,)))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('assets.aws.s3.abort_multipart_upload')
+    def test_multipart_abort(self, patch_api):
+        patch_api.return_value = True
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.delete(reverse('assets-multipart-abort', args=(self.file.uuid,)))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(File.objects.filter(pk=self.file.pk).exists())
+
+
+class FileListTests(APITestCase):
+
+    def setUp(self):
+        self.test_user = User.objects.create_user(username='test_user',
+                                                  password='test',
+                                                  email='test@test.test')
+        self.client = APIClient()
+
+        self.folder = Folder.objects.create(title='test_folder_1', owner=self.test_user, parent=None)
+        for title, folder in (('b.txt', self.folder), ('a.jpg', self.folder), ('c.jpg', None), ('a.txt', None)):
+            File.objects.create(title=title,
+                                owner=self.test_user,
+                                folder=folder,
+                                relative_key=f'users/{self.test_user.pk}/assets/{uuid.uuid4()}',
+                                extension=os.path.splitext(title)[1],
+                                size=1024)
+
+    def get_titles(self, params):
+        titles = []
+        url = '/api/assets/files/'
+        while url is not None:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles.extend(file['title'] for file in response.data['results'])
+            url, params = response.data['next'], None
+        return titles
+
+    def test_file_list_pages(self):
+        self.client.force_authenticate(user=self.test_user)
+        self.assertEqual(self.get_titles({'page_size': 1}), ['a.jpg', 'b.txt', 'a.txt', 'c.jpg'])
+        self.assertEqual(self.get_titles({'page_size': 3}), ['a.jpg', 'b.txt', 'a.txt', 'c.jpg'])
+
+    def test_file_list_filters(self):
+        self.client.force_authenticate(user=self.test_user)
+        self.assertEqual(self.get_titles({'folder': str(self.folder.uuid)}), ['a.jpg', 'b.txt'])
+        self.assertEqual(self.get_titles({'extension': '.jpg', 'page_size': 1}), ['a.jpg', 'c.jpg'])
+
+    def test_file_list_cursor_wrong_values(self):
+        self.client.force_authenticate(user=self.test_user)
+        for values in ([self.folder.pk, 'a.jpg'], ['1', 'a.jpg', 1], [self.folder.pk, 'a.jpg', 1.5]):
+            response = self.client.get('/api/assets/files/', {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
+
+    def test_file_list_fields(self):
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.get('/api/assets/files/', {'folder': str(self.folder.uuid), 'page_size': 1})
+        file = File.objects.get(title='a.jpg')
+        self.assertEqual(response.data['results'], [{'title': 'a.jpg', 'folder': 'test_folder_1', 'extension': '.jpg',
+                                                     'size': 1024, 'relative_key': file.uuid}])
+
+
+    def test_file_create_negative_size(self):
+        self.client.force_authenticate(user=self.test_user)
+        used_size = StorageUsage.objects.get(user=self.test_user).used_size
+        response = self.client.post('/api/assets/files/', {'title': 'big.txt', 'extension': '.txt',
+                                                           'size': -10 ** 12}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(StorageUsage.objects.get(user=self.test_user).used_size, used_size)
+        self.assertFalse(File.objects.filter(title='big.txt').exists())
+
+class SearchTests(APITestCase):
+
+    def setUp(self):
+        self.test_user = User.objects.create_user(username='test_user',
+                                                  password='test',
+                                                  email='test@test.test')
+        self.test_user_2 = User.objects.create_user(username='test_user_2',
+                                                    password='test',
+                                                    email='test_2@test.test')
+        self.client = APIClient()
+
+        self.folder = Folder.objects.create(title='reports', owner=self.test_user, parent=None)
+        self.sub_folder = Folder.objects.create(title='annual reports', owner=self.test_user, parent=self.folder)
+        for title, folder, owner in (('report_2021.xlsx', self.sub_folder, self.test_user),
+                                     ('report_2022.xlsx', None, self.test_user),
+                                     ('photo.jpg', self.folder, self.test_user),
+                                     ('report_2023.xlsx', None, self.test_user_2)):
+            File.objects.create(title=title,
+                                owner=owner,
+                                folder=folder,
+                                relative_key=f'users/{owner.pk}/assets/{uuid.uuid4()}',
+                                size=1024)
+
+    def get_results(self, params):
+        results = []
+        url = reverse('assets-search')
+        while url is not None:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results.extend(response.data['results'])
+            url, params = response.data['next'], None
+        return results
+
+    def test_search_unauthorized(self):
+        response = self.client.get(reverse('assets-search'), {'q': 'report'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_search_without_query(self):
+        self.client.force_authenticate(user=self.test_user)
+        response = self.client.get(reverse('assets-search'), {'q': ' '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_invalid_cursor(self):
+        self.client.force_authenticate(user=self.test_user)
+        for values in ([0.5, True], ['0.5', True, 1], [0.5, 1, 1], [0.5, True, 'a'], [None, True, 1]):
+            response = self.client.get(reverse('assets-search'), {'q': 'report', 'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
+
+    def test_search_owner_assets(self):
+        self.client.force_authenticate(user=self.test_user)
+        results = self.get_results({'q': 'report'})
+        self.assertEqual(sorted(result['title'] for result in results),
+                         ['annual reports', 'report_2021.xlsx', 'report_2022.xlsx', 'reports'])
+        self.assertEqual(results, sorted(results, key=lambda result: -result['rank']))
+
+    def test_search_pages(self):
+        self.client.force_authenticate(user=self.test_user)
+        titles = [result['title'] for result in self.get_results({'q': 'report'})]
+        self.assertEqual([result['title'] for result in self.get_results({'q': 'report', 'page_size': 1})], titles)
+
+    def test_search_folder_path(self):
+        self.client.force_authenticate(user=self.test_user)
+        results = {result['title']: result for result in self.get_results({'q': 'report_2021'})}
+        self.assertEqual(results['report_2021.xlsx']['folder_path'], 'reports/annual reports')
+        self.assertFalse(results['report_2021.xlsx']['is_folder'])
+
+    def test_search_in_folder(self):
+        self.client.force_authenticate(user=self.test_user)
+        results = self.get_results({'q': 'report', 'folder': str(self.sub_folder.uuid)})
+        self.assertEqual([result['title'] for result in results], ['annual reports', 'report_2021.xlsx'])
+
+    def test_search_in_folder_of_another_user(self):
+        self.client.force_authenticate(user=self.test_user_2)
+        response = self.client.get(reverse('assets-search'), {'q': 'report', 'folder': str(self.folder.uuid)})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,5 +1,6 @@
 """Tests for s3 methods of Assets application."""
 import tempfile
+import threading
 from unittest.mock import Mock, patch
 import uuid
 
@@ -50,3 +51,85 @@ class TestS3Methods(TestCase):
         api_call.return_value = True
         response = s3.delete_key(self.file.relative_key)
         self.assertTrue(response)
+
+    @patch('assets.aws.s3.create_bucket')
+    def test_delete_keys_batches(self, mock_bucket):
+        """Test delete keys func splits keys by DeleteObjects limit."""
+        bucket = Mock()
+        bucket.delete_objects.return_value = {}
+        mock_bucket.return_value = bucket
+        keys = [f'users/{self.user.pk}/assets/{uuid.uuid4()}' for _ in range(2500)]
+        self.assertTrue(s3.delete_keys(keys))
+        self.assertEqual(bucket.delete_objects.call_count, 3)
+        last_batch = bucket.delete_objects.call_args.kwargs['Delete']['Objects']
+        self.assertEqual(len(last_batch), 500)
+
+    @patch('assets.aws.s3.create_bucket')
+    def test_delete_recursive(self, mock_bucket):
+        """Test delete folder with nested folders, files and shares."""
+        bucket = Mock()
+        bucket.delete_objects.return_value = {}
+        mock_bucket.return_value = bucket
+        folder = models.Folder.objects.create(title='folder', owner=self.user, parent=None)
+        child = models.Folder.objects.create(title='child', owner=self.user, parent=folder)
+        file = models.File.objects.create(title='file.jpg',
+                                          owner=self.user,
+                                          folder=child,
+                                          relative_key=f'users/{self.user.pk}/assets/{uuid.uuid4()}',
+                                          thumbnail_key='thumbnail',
+                                          size=1024,
+                                          extension='.jpg')
+        user_2 = User.objects.create_user(username='test_user_2', password='test', email='test_2@test.test')
+        models.SharedTable.objects.create(file=file, user=user_2, expired='2100-01-01 00:00Z',
+                                          permission_flags=models.Permissions.FLAGS[models.Permissions.READ_ONLY])
+
+        self.assertTrue(s3.delete_recursive(folder.uuid))
+        self.assertFalse(models.Folder.objects.exists())
+        self.assertFalse(models.SharedTable.objects.exists())
+        self.assertEqual(models.File.objects.count(), 1)
+        objects = bucket.delete_objects.call_args.kwargs['Delete']['Objects']
+        self.assertEqual({obj['Key'] for obj in objects}, {file.relative_key, 'thumbnail'})
+
+    @patch('assets.aws.s3._client', None)
+    @patch('assets.aws.s3._local', new_callable=threading.local)
+    def test_shared_client(self, mock_local):
+        """Test S3 client is shared by threads and resources are created once per thread."""
+        with patch('boto3.session.Session') as mock_session:
+            mock_session.return_value.resource.side_effect = lambda *args, **kwargs: Mock()
+            s3.create_bucket()
+            s3.create_bucket()
+            self.assertEqual(s3.get_client(), s3.get_resource().meta.client)
+            self.assertEqual(mock_session.return_value.resource.call_count, 1)
+
+            resources = []
+            thread = threading.Thread(target=lambda: resources.append(s3.get_resource()))
+            thread.start()
+            thread.join()
+            self.assertNotEqual(resources[0], s3.get_resource())
+            self.assertEqual(resources[0].meta.client, s3.get_client())
+            self.assertEqual(mock_session.return_value.resource.call_count, 2)
+            self.assertEqual(mock_session.return_value.client.call_count, 1)
+
+    @patch('assets.aws.s3.get_client')
+    def test_presigned_url_cache(self, mock_client):
+        """Test presigned URLs are signed once per key and disposition."""
+        s3.url_cache.clear()
+        mock_client.return_value.generate_presigned_url.side_effect = lambda *args, **kwargs: str(kwargs['Params'])
+        first_url = s3.get_presigned_url('key')
+        self.assertEqual(s3.get_presigned_url('key'), first_url)
+        self.assertNotEqual(s3.get_presigned_url('key', disposition='attachment'), first_url)
+        self.assertEqual(mock_client.return_value.generate_presigned_url.call_count, 2)
+
+    def test_presigned_url_cache_eviction(self):
+        """Test presigned URLs cache evicts least recently used and expired URLs."""
+        cache = s3.PresignedUrlCache(max_size=2, timeout=60)
+        cache.set('first', 'url_1')
+        cache.set('second', 'url_2')
+        cache.get('first')
+        cache.set('third', 'url_3')
+        self.assertEqual(cache.get('first'), 'url_1')
+        self.assertIsNone(cache.get('second'))
+
+        expired_cache = s3.PresignedUrlCache(max_size=2, timeout=0)
+        expired_cache.set('first', 'url_1')
+        self.assertIsNone(expired_cache.get('first'))
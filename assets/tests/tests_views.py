@@ -5,11 +5,13 @@ import uuid
 
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import override_settings, TestCase
 from django.urls import reverse
 
 from assets import forms
 from assets import models
+from assets.pagination import encode_cursor
+from assets.tests.utils import QueryBudgetMixin
 
 
 class TestRootPageView(TestCase):
@@ -60,6 +62,15 @@ class TestRootPageView(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'authentication/login.html')
 
+    def test_root_page_invalid_cursor(self):
+        """Test root page with malformed cursor is a bad request."""
+        self.client.login(**self.credentials)
+        for cursor in ('invalid', encode_cursor([True, 'a']), encode_cursor(['true', 'a', 1]),
+                       encode_cursor([True, 'a', 'b']), encode_cursor([True, 'a', 2 ** 63])):
+            response = self.client.get(reverse('root_page'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertTemplateUsed(response, 'assets/errors/400_error_page.html')
+
 
 class TestUploadFileView(TestCase):
     """Tests for upload_file view."""
@@ -98,6 +109,18 @@ class TestUploadFileView(TestCase):
         self.assertTrue(form.is_valid())
         self.assertEqual(response.status_code, 200)
 
+    @override_settings(USER_STORAGE_QUOTA=5)
+    @patch('assets.aws.s3.upload_file')
+    def test_upload_file_over_quota(self, s3_api_call):
+        """Test file over quota is not uploaded to S3."""
+        form_data = {
+            'file': SimpleUploadedFile('test.txt', b'test-payload'),
+        }
+        response = self.client.post('/upload_file/', data=form_data, follow=True)
+        self.assertContains(response, 'Storage quota exceeded.')
+        s3_api_call.assert_not_called()
+        self.assertFalse(models.File.objects.exists())
+
 
 class TestCreateFolderView(TestCase):
     """Tests for create_folder view."""
@@ -318,3 +341,50 @@ class TestDeleteFolderView(TestCase):
         response = self.client.get(reverse('delete_folder'), follow=True, data=self.get_params)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(models.Folder.objects.count(), 0)
+
+
+class TestShareViewsQueries(QueryBudgetMixin, TestCase):
+    """Tests for number of queries in views of shares."""
+
+    def setUp(self) -> None:
+        """Set default values for each test."""
+        self.user = User.objects.create_user(username='test_user',
+                                             password='test',
+                                             email='test@test.test')
+        self.client.login(username='test_user', password='test')
+
+        for number in range(5):
+            owner = User.objects.create_user(username=f'owner_{number}', password='test')
+            user = User.objects.create_user(username=f'user_{number}', password='test')
+            shared_file = models.File.objects.create(title=f'shared_{number}.txt',
+                                                     owner=owner,
+                                                     relative_key=str(uuid.uuid4()),
+                                                     extension='.txt',
+                                                     size=1024)
+            own_file = models.File.objects.create(title=f'own_{number}.txt',
+                                                  owner=self.user,
+                                                  relative_key=str(uuid.uuid4()),
+                                                  extension='.txt',
+                                                  size=1024)
+            models.SharedTable.objects.create(file=shared_file, user=self.user, expired='2100-01-01 00:00Z',
+                                              permission_flags=7)
+            self.share = models.SharedTable.objects.create(file=own_file, user=user, expired='2100-01-01 00:00Z',
+                                                           permission_flags=1)
+
+    def test_root_page(self):
+        """Test root page queries do not depend on number of shares."""
+        with self.assertMaxNumQueries(4):
+            response = self.client.get(reverse('root_page'))
+        self.assertContains(response, 'shared_4.txt')
+
+    def test_share_list(self):
+        """Test share list queries do not depend on number of shares."""
+        with self.assertMaxNumQueries(3):
+            response = self.client.get(reverse('share-list'))
+        self.assertContains(response, 'own_4.txt | user_4')
+
+    def test_update_share(self):
+        """Test ownership of share is checked with one query."""
+        with self.assertMaxNumQueries(5):
+            response = self.client.get(f'/assets/files/share/{self.share.pk}/update/')
+        self.assertEqual(response.status_code, 200)
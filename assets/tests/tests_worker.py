@@ -0,0 +1,36 @@
+"""Tests for cleanup queries of Celery worker."""
+import uuid
+
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase
+
+from assets import models
+from assets.tests.utils import WorkerDatabaseMixin
+
+
+class TestDeleteNotUploadedFiles(WorkerDatabaseMixin, TransactionTestCase):
+    """TestCase class for testing deletion of files with aborted multipart uploads."""
+
+    def setUp(self) -> None:
+        """Set default values for each test."""
+        super().setUp()
+        self.user = User.objects.create(username='test_user')
+        self.other_user = User.objects.create(username='other_user')
+        self.files = [models.File.objects.create(title=f'file_{number}.txt',
+                                                 owner=self.user,
+                                                 relative_key=f'users/{self.user.pk}/assets/{uuid.uuid4()}',
+                                                 size=100,
+                                                 is_uploaded=False,
+                                                 upload_id='upload-id')
+                      for number in range(2)]
+
+    def test_shared_reserved_file(self):
+        """Test shared reserved file is deleted with its share and usage is released."""
+        models.SharedTable.objects.create(file=self.files[0], user=self.other_user,
+                                          expired='2100-01-01 00:00Z', permission_flags=1)
+
+        deleted = self.worker_queries.delete_not_uploaded_files([file.relative_key for file in self.files])
+        self.assertEqual(deleted, 2)
+        self.assertFalse(models.File.objects.exists())
+        self.assertFalse(models.SharedTable.objects.exists())
+        self.assertEqual(models.StorageUsage.objects.get(user=self.user).used_size, 0)
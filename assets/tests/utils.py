@@ -0,0 +1,56 @@
+"""Helpers for tests of Assets application."""
+from contextlib import contextmanager
+import importlib
+import os
+import sys
+from unittest.mock import patch
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Mixin for TestCase to limit number of queries."""
+
+    @contextmanager
+    def assertMaxNumQueries(self, num):
+        """Fail if the block executes more than 'num' queries."""
+        with CaptureQueriesContext(connection) as context:
+            yield context
+
+        queries = '\n'.join(query['sql'] for query in context.captured_queries)
+        self.assertLessEqual(len(context), num,
+                             f'{len(context)} queries executed, budget is {num}:\n{queries}')
+
+
+def import_worker_module(name):
+    """Import module of the Celery worker by its name as the worker does."""
+    worker_dir = os.path.join(settings.BASE_DIR, 'celery')
+    if worker_dir not in sys.path:
+        sys.path.insert(0, worker_dir)
+    return importlib.import_module(name)
+
+
+class WorkerDatabaseMixin:
+    """Mixin for TransactionTestCase to run queries of the Celery worker on the test database.
+
+    Extra environment of the worker connections is set in 'worker_environ'.
+    """
+
+    worker_environ = {}
+
+    def setUp(self):
+        """Point connection pools of the worker to the test database."""
+        super().setUp()
+        self.worker_queries = import_worker_module('queries')
+        environ = {'DB_NAME': connection.settings_dict['NAME'], 'DB_REPLICA_HOSTS': '', **self.worker_environ}
+        self.worker_environ_patch = patch.dict(os.environ, environ)
+        self.worker_environ_patch.start()
+        self.worker_queries.init_pools()
+
+    def tearDown(self):
+        """Close connections of the worker."""
+        self.worker_queries.close_pools()
+        self.worker_environ_patch.stop()
+        super().tearDown()
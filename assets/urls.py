@@ -13,7 +13,20 @@ api_urlpatterns = [
     path('assets/files/shared-with-me/', views_v2.ListSharedFilesView.as_view()),
     path('assets/files/shared-with-me/<str:uuid>/', views_v2.SharedFileRetrieveUpdateDestroyView.as_view()),
     path('assets/files/thumbnail/<str:uuid>/', views_v2.CreateThumbnailView.as_view()),
+    path('assets/files/upload/', views_v2.FileUploadCreateView.as_view(), name='assets-file-upload'),
+    path('assets/files/upload/<str:uuid>/', views_v2.FileUploadAbortView.as_view(), name='assets-file-upload-abort'),
+    path('assets/files/upload/<str:uuid>/complete/', views_v2.FileUploadCompleteView.as_view(),
+         name='assets-file-upload-complete'),
+    path('assets/files/multipart/', views_v2.MultipartUploadCreateView.as_view(), name='assets-multipart'),
+    path('assets/files/multipart/<str:uuid>/', views_v2.MultipartUploadAbortView.as_view(),
+         name='assets-multipart-abort'),
+    path('assets/files/multipart/<str:uuid>/parts/', views_v2.MultipartUploadPartsView.as_view(),
+         name='assets-multipart-parts'),
+    path('assets/files/multipart/<str:uuid>/complete/', views_v2.MultipartUploadCompleteView.as_view(),
+         name='assets-multipart-complete'),
     path('assets/files/<str:uuid>/', views_v2.FileRetrieveUpdateDestroyView.as_view()),
+    path('assets/search/', views_v2.SearchView.as_view(), name='assets-search'),
+    path('assets/usage/', views_v2.StorageUsageView.as_view(), name='assets-usage'),
 ]
 
 urlpatterns = [
@@ -22,3 +22,8 @@ def custom_exception_handler(exc, context):
 def create_file_relative_key(user_id):
     """Generate unique key."""
     return f'users/{user_id}/assets/{uuid.uuid4()}'
+
+
+def get_uuid_from_key(relative_key):
+    """Return uuid part of the file's relative key."""
+    return str(relative_key).split('/')[-1] or None
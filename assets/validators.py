@@ -16,7 +16,7 @@ def validate_exist_file_in_folder(file_name, user, folder=None):
 
 def validate_exist_file(user, file_uuid):
     """Validate exists file in DB."""
-    file_exist = models.File.objects.filter(relative_key__contains=file_uuid,
+    file_exist = models.File.objects.filter(uuid=file_uuid,
                                             owner=user).exists()
     return file_exist
 
@@ -25,18 +25,29 @@ def validate_exist_file(user, file_uuid):
 
 def validate_get_params(params):
     """Validate get parameters."""
-    accept_params = ['folder', 'file']
+    accept_params = ['folder', 'file', 'cursor']
     for param in params:
         if param not in accept_params:
             return False
     return True
 
 
+def validate_storage_quota(user, size):
+    """Validate the user has free storage for a file of the size.
+
+    Must be called in the transaction creating the file. The usage row stays
+    locked until its end, so concurrent uploads of the user are checked one
+    after another against the updated usage.
+    """
+    usage, _ = models.StorageUsage.objects.select_for_update().get_or_create(user=user)
+    return usage.used_size + size <= usage.get_quota()
+
+
 def validate_file_permission(user, file_id):
     """Validate permissions for the file."""
-    file_obj = models.File.objects.filter(relative_key__contains=file_id).exists()
+    file_obj = models.File.objects.filter(uuid=file_id).exists()
     if file_obj:
-        file_obj = models.File.objects.filter(relative_key__contains=file_id).first()
+        file_obj = models.File.objects.filter(uuid=file_id).first()
         return True if file_obj.owner == user else False
     return False
 
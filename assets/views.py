@@ -1,20 +1,20 @@
 """Views for Assets application."""
 import logging
-
-from datetime import datetime
 import os
 import uuid
 
 from django import http
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from django.db.models import F
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.db import IntegrityError
 
 from assets import forms
 from assets import models
+from assets import pagination
 from assets import validators
 from assets.aws import s3
 from assets.db import queries
@@ -30,9 +30,6 @@ def health_check(request):
 @login_required(login_url='/login/')
 def show_page(request):
     """Render page for display assets."""
-    profile.enable()
-    now = datetime.now()
-
     folder_id = request.GET.get('folder')
 
     validate_params_status = validators.validate_get_params(dict(request.GET))
@@ -47,24 +44,67 @@ def show_page(request):
     folder_obj = get_object_or_404(models.Folder,
                                    uuid=folder_id) if folder_id else None
 
-    queries.delete_expired_shares()
+    try:
+        cursor = request.GET.get('cursor')
+        after = pagination.decode_cursor(cursor, (bool, str, int)) if cursor else None
+    except ValueError:
+        return http.HttpResponseBadRequest(
+            content=render_to_string(
+                request=request,
+                template_name='assets/errors/400_error_page.html'
+            ))
+
+    rows = queries.get_assets_list(folder_id, request.user.pk, after, settings.ASSETS_PAGE_SIZE + 1)
 
-    rows = queries.get_assets_list(folder_id, request.user.pk)
+    next_cursor = None
+    if len(rows) > settings.ASSETS_PAGE_SIZE:
+        rows = rows[:settings.ASSETS_PAGE_SIZE]
+        last_row = rows[-1]
+        next_cursor = pagination.encode_cursor([last_row['is_folder'], last_row['title'], last_row['id']])
 
     rows = s3.get_thumbnails(rows)
 
-    shared_rows = models.SharedTable.objects.filter(user=request.user,
-                                                    created_at__lt=F('expired'))
-    for row in shared_rows:
-        row.file.relative_key = row.file.relative_key.split('/')[-1]
+    shared_rows = models.SharedTable.objects.active().filter(user=request.user).select_related('file')
 
-    context = {'rows': rows, 'folder_obj': folder_obj, 'shared_rows': shared_rows}
+    context = {'rows': rows, 'folder_obj': folder_obj, 'shared_rows': shared_rows,
+               'cursor': cursor, 'next_cursor': next_cursor}
 
-    profile.disable()
-    profile.dump_stats(f'profilers/{__name__}_show_page_{now}.prof')
     return render(request, 'assets/root_page.html', context)
 
 
+def validate_upload(user, uploaded_file, folder):
+    """Return error message if the file cannot be uploaded to the folder, otherwise None.
+
+    Quota is checked before the upload to S3 and once more when the file is
+    created, because concurrent uploads may use the space meanwhile.
+    """
+    if validators.validate_exist_file_in_folder(uploaded_file.name, user=user, folder=folder):
+        return 'The file already exists.'
+    with transaction.atomic():
+        if not validators.validate_storage_quota(user, uploaded_file.size):
+            return 'Storage quota exceeded.'
+    return None
+
+
+def create_uploaded_file(user, uploaded_file, folder, key):
+    """Create the uploaded file if it fits the user's storage quota.
+
+    Otherwise delete the uploaded object and return False.
+    """
+    with transaction.atomic():
+        if validators.validate_storage_quota(user, uploaded_file.size):
+            queries.create_file(uploaded_file.name,
+                                user,
+                                folder,
+                                key,
+                                uploaded_file.size,
+                                os.path.splitext(uploaded_file.name)[1])
+            return True
+
+    s3.delete_keys([key])
+    return False
+
+
 @login_required(login_url='/login/')
 def user_upload_file(request):
     """Upload file to S3.
@@ -75,9 +115,6 @@ def user_upload_file(request):
 
     if request.method == 'POST':
 
-        profile.enable()
-        now = datetime.now()
-
         form = forms.UploadFileForm(request.POST, request.FILES)
         if form.is_valid():
             parent_folder = request.GET.get('folder')
@@ -93,43 +130,23 @@ def user_upload_file(request):
                         template_name='assets/errors/400_error_page.html'
                     ))
 
-            file_name = uploaded_file.name
-
-            parent_folder_instance = models.Folder.objects.filter(uuid=parent_folder).first()
-            file_exist = validators.validate_exist_file_in_folder(
-                file_name,
-                user=request.user,
-                folder=parent_folder_instance)
-
-            if file_exist:
-                messages.error(request, 'The file already exists.')
+            parent_folder = models.Folder.objects.filter(uuid=parent_folder).first()
+            error = validate_upload(request.user, uploaded_file, parent_folder)
+            if error is not None:
+                messages.error(request, error)
                 return redirect('root_page')
 
-            folder_exists = models.Folder.objects.filter(
-                uuid=parent_folder).exists()
-
-            if folder_exists:
-                parent_folder = models.Folder.objects.get(uuid=parent_folder)
-            else:
-                parent_folder = None
-
             file_key = f'users/{request.user.pk}/assets/{str(uuid.uuid4())}'
 
             if s3.upload_file(uploaded_file.file,
                               file_key,
                               os.path.splitext(uploaded_file.name)[1],
                               uploaded_file.content_type):
-                queries.create_file(file_name,
-                                    request.user,
-                                    parent_folder,
-                                    file_key,
-                                    uploaded_file.size,
-                                    os.path.splitext(uploaded_file.name)[1])
+                if not create_uploaded_file(request.user, uploaded_file, parent_folder, file_key):
+                    messages.error(request, 'Storage quota exceeded.')
+                    return redirect('root_page')
                 messages.success(request, 'The file was uploaded.')
 
-                profile.disable()
-                profile.dump_stats(f'profilers/{__name__}_upload_file_{now}.prof')
-
                 if parent_folder is not None:
                     return redirect(f'/?folder={parent_folder.uuid}')
                 else:
@@ -307,7 +324,7 @@ def delete_file(request):
                     template_name='assets/errors/400_error_page.html'
                 ))
 
-        file_obj = models.File.objects.filter(relative_key__contains=file_uuid).first()
+        file_obj = models.File.objects.filter(uuid=file_uuid).first()
         folder_uuid = file_obj.folder.uuid if file_obj.folder else None
 
         try:
@@ -364,8 +381,7 @@ def delete_folder(request):
         parent_uuid = folder_obj.parent.uuid if folder_obj.parent else None
 
         try:
-            with transaction.atomic():
-                s3.delete_recursive(folder_uuid)
+            s3.delete_recursive(folder_uuid)
         except IntegrityError as e:
             logger.exception(f'Exception while deleting folder {folder_uuid}. {str(e)}')
             messages.error(request, 'Cannot delete file. Try again. ')
@@ -411,7 +427,7 @@ def move_file(request):
             params_status = validators.validate_get_params(dict(request.GET))
 
             if file_exist_status and folder_exist_status:
-                file = models.File.objects.filter(relative_key__contains=file_uuid).first()
+                file = models.File.objects.filter(uuid=file_uuid).first()
                 if new_folder is not None:
                     new_folder = models.Folder.objects.filter(uuid=new_folder).first()
                 file_name = file.title
@@ -504,7 +520,7 @@ def rename_file(request):
                     ))
 
             if file_exist_status:
-                file = models.File.objects.filter(relative_key__contains=file_uuid).first()
+                file = models.File.objects.filter(uuid=file_uuid).first()
                 folder = file.folder
                 file_exist_in_folder = validators.validate_exist_file_in_folder(new_title,
                                                                                 request.user,
@@ -7,14 +7,12 @@ from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.db import IntegrityError, transaction
-from django.db.models import F
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils import timezone
 from rest_framework import generics
 from rest_framework import mixins
 from rest_framework import status
 from rest_framework.authentication import BasicAuthentication
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import ParseError, PermissionDenied
 from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -23,6 +21,7 @@ from rest_framework.views import APIView
 
 from assets import forms
 from assets import models
+from assets import pagination
 from assets import permissions
 from assets import serializers
 from assets import validators
@@ -40,11 +39,8 @@ class UpdateShareView(LoginRequiredMixin, views.View):
 
     def get(self, request, share_id):
         """Create empty form."""
-        share = get_object_or_404(models.SharedTable, id=share_id)
-        owned_shared_rows = models.SharedTable.objects.filter(
-            file_id__in=[file.id for file in request.user.files.all()]
-        )
-        if share not in owned_shared_rows:
+        share = get_object_or_404(models.SharedTable.objects.select_related('file'), id=share_id)
+        if share.file.owner_id != request.user.pk:
             return http.HttpResponseForbidden(
                 content=render(request=request, template_name='assets/errors/403_error_page.html')
             )
@@ -57,11 +53,8 @@ class UpdateShareView(LoginRequiredMixin, views.View):
 
     def post(self, request, share_id):
         """Update share object."""
-        share = get_object_or_404(models.SharedTable, id=share_id)
-        owned_shared_rows = models.SharedTable.objects.filter(
-            file_id__in=[file.id for file in request.user.files.all()]
-        )
-        if share not in owned_shared_rows:
+        share = get_object_or_404(models.SharedTable.objects.select_related('file'), id=share_id)
+        if share.file.owner_id != request.user.pk:
             return http.HttpResponseForbidden(
                 content=render(request=request, template_name='assets/errors/403_error_page.html')
             )
@@ -84,8 +77,8 @@ class ListShareView(LoginRequiredMixin, views.View):
         """List of shares."""
         return render(request,
                       'assets/share_details.html',
-                      {'rows': models.SharedTable.objects.filter(
-                          file_id__in=[file.id for file in request.user.files.all()])}
+                      {'rows': models.SharedTable.objects.active().filter(
+                          file__owner=request.user).select_related('file', 'user')}
                       )
 
 
@@ -96,11 +89,8 @@ class DeleteShareView(LoginRequiredMixin, views.View):
 
     def get(self, request, share_id):
         """Delete share."""
-        share = get_object_or_404(models.SharedTable, id=share_id)
-        owned_shared_rows = models.SharedTable.objects.filter(
-            file_id__in=[file.id for file in request.user.files.all()]
-        )
-        if share not in owned_shared_rows:
+        share = get_object_or_404(models.SharedTable.objects.select_related('file'), id=share_id)
+        if share.file.owner_id != request.user.pk:
             return http.HttpResponseForbidden(
                 content=render(request=request, template_name='assets/errors/403_error_page.html')
             )
@@ -116,7 +106,7 @@ class CreateShareView(LoginRequiredMixin, views.View):
 
     def get(self, request, uuid):
         """Create empty form."""
-        file = models.File.objects.filter(relative_key__contains=uuid).first()
+        file = models.File.objects.filter(uuid=uuid).first()
         if not file:
             logger.warning(f'[{request.user.username}] try to rename is not exist folder - UUID: {uuid}')
             return http.HttpResponseNotFound(
@@ -136,7 +126,7 @@ class CreateShareView(LoginRequiredMixin, views.View):
 
     def post(self, request, uuid):
         """Create ShareTable."""
-        file = models.File.objects.filter(relative_key__contains=uuid).first()
+        file = models.File.objects.filter(uuid=uuid).first()
         if not file:
             logger.warning(f'[{request.user.username}] try to share file is not exist. - UUID: {uuid}')
             return http.HttpResponseNotFound(
@@ -161,14 +151,14 @@ class CreateShareView(LoginRequiredMixin, views.View):
             messages.success(request, 'The File was shared successfully.')
             return redirect('root_page')
 
+        queries.delete_expired_share(file, shared_user)
         try:
-            instance = models.SharedTable.objects.create(
+            models.SharedTable.objects.create(
                 file_id=file.pk,
                 user=shared_user,
                 expired=form.cleaned_data['expired'],
+                permission_flags=models.Permissions.get_flags(form.cleaned_data['permissions']),
             )
-            instance.permissions.set(form.cleaned_data['permissions'])
-            instance.save()
         except IntegrityError as e:
             logger.exception(f'[{request.user.username}] {str(e)} ')
             messages.error(request, 'Current share already exists.')
@@ -185,15 +175,13 @@ class DownloadShareFileView(LoginRequiredMixin, views.View):
 
     def get(self, request, uuid):
         """Get a shared file."""
-        if not models.SharedTable.objects.filter(
-                file__relative_key__contains=uuid,
-                user=request.user.pk,
-                permissions__name=models.Permissions.READ_ONLY).exists():
+        shared_file = permissions.get_shared_file(request, uuid, models.Permissions.READ_ONLY)
+        if shared_file is None:
             logger.warning(f'[{request.user.username}] try to get access to the denied file - ID: {uuid} .')
             return http.HttpResponseForbidden(
                 content=render(request=request, template_name='assets/errors/403_error_page.html')
             )
-        download_url = s3.get_url(uuid)
+        download_url = s3.get_file_url(shared_file.file)
 
         return redirect(download_url)
 
@@ -205,10 +193,8 @@ class RenameShareFileView(LoginRequiredMixin, views.View):
 
     def get(self, request, uuid):
         """Create empty form."""
-        if not models.SharedTable.objects.filter(
-                file__relative_key__contains=uuid,
-                user=request.user.pk,
-                permissions__name=models.Permissions.RENAME_ONLY).exists():
+        shared_file = permissions.get_shared_file(request, uuid, models.Permissions.RENAME_ONLY)
+        if shared_file is None:
             logger.warning(f'[{request.user.username}] try to get access to the denied file - uuid: {uuid} .')
             return http.HttpResponseForbidden(
                 content=render(request=request, template_name='assets/errors/403_error_page.html')
@@ -221,16 +207,14 @@ class RenameShareFileView(LoginRequiredMixin, views.View):
 
     def post(self, request, uuid):
         """Rename file."""
-        if not models.SharedTable.objects.filter(
-                file__relative_key__contains=uuid,
-                user=request.user.pk,
-                permissions__name=models.Permissions.RENAME_ONLY).exists():
+        shared_file = permissions.get_shared_file(request, uuid, models.Permissions.RENAME_ONLY)
+        if shared_file is None:
             logger.warning(f'[{request.user.username}] try to get access to the denied file - uuid: {uuid} .')
             return http.HttpResponseForbidden(
                 content=render(request=request, template_name='assets/errors/403_error_page.html')
             )
 
-        file = models.File.objects.filter(relative_key__contains=uuid).first()
+        file = shared_file.file
 
         form = forms.InputNameForm(request.POST)
         if not form.is_valid():
@@ -250,23 +234,20 @@ class DeleteShareFileView(LoginRequiredMixin, views.View):
     def get(self, request, uuid):
         """Delete a shared file."""
 
-        if not models.SharedTable.objects.filter(
-                file__relative_key__contains=uuid,
-                user=request.user.pk,
-                permissions__name=models.Permissions.DELETE_ONLY).exists():
+        shared_file = permissions.get_shared_file(request, uuid, models.Permissions.DELETE_ONLY)
+        if shared_file is None:
             logger.warning(f'[{request.user.username}] try to get access to the denied file - UUID: {uuid} .')
             return http.HttpResponseForbidden(
                 content=render(request=request, template_name='assets/errors/403_error_page.html')
             )
-        file = models.File.objects.filter(relative_key__contains=uuid).first()
-        share = models.SharedTable.objects.filter(file__relative_key__contains=uuid, user=request.user.pk).first()
+        file = shared_file.file
 
         try:
             with transaction.atomic():
-                share.delete()
+                models.SharedTable.objects.filter(pk=shared_file.share_id).delete()
                 file.delete()
         except IntegrityError as e:
-            logger.exception(f'Exception while deleting shared file obj: {file.relative_key.split("/")[-1]}. {str(e)}')
+            logger.exception(f'Exception while deleting shared file obj: {file.uuid}. {str(e)}')
 
         return redirect('root_page')
 
@@ -352,10 +333,21 @@ class FolderListCreateView(generics.ListCreateAPIView):
     serializer_class = serializers.FolderListCreateSerializer
     parser_classes = (JSONParser,)
     lookup_field = 'uuid'
+    pagination_class = pagination.KeysetPagination
+    keyset_ordering = ('parent_id', 'title', 'id')
+    keyset_types = ((int, None), str, int)
 
     def get_queryset(self):
-        """Filter objects by user."""
-        return models.Folder.objects.filter(owner=self.request.user)
+        """Filter objects by user and parent folder."""
+        queryset = models.Folder.objects.filter(
+            owner=self.request.user
+        ).select_related('parent').only('id', 'title', 'uuid', 'parent_id', 'parent__title')
+
+        parent_uuid = self.request.query_params.get('parent')
+        if parent_uuid is not None:
+            validators.validate_uuid(parent_uuid)
+            queryset = queryset.filter(parent__uuid=parent_uuid)
+        return queryset
 
     def perform_create(self, serializer):
         """Override this method to save additional fields."""
@@ -377,12 +369,7 @@ class ShareListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         """Filter objects by user."""
-        queries.delete_expired_shares()
-        now = timezone.now()
-        return models.SharedTable.objects.filter(
-            file__owner=self.request.user,
-            expired__gt=now
-        )
+        return models.SharedTable.objects.active().filter(file__owner=self.request.user)
 
     def create(self, request, *args, **kwargs):
         """Override 'create' method to return 201 Created to exclude payload."""
@@ -425,23 +412,19 @@ class SharedFileRetrieveUpdateDestroyView(APIView):
 
     def get(self, request, uuid):
         """Get download URL for a shared file."""
-        if not models.SharedTable.objects.filter(
-                file__relative_key__contains=uuid,
-                user=request.user.pk,
-                permissions__name=models.Permissions.READ_ONLY).exists():
+        shared_file = permissions.get_shared_file(request, uuid, models.Permissions.READ_ONLY)
+        if shared_file is None:
             raise PermissionDenied(detail='You do not have permission to perform this action.')
 
-        return Response({'url': s3.get_url(uuid)})
+        return Response({'url': s3.get_file_url(shared_file.file)})
 
     def put(self, request, uuid):
         """Rename file if permission is okay."""
-        if not models.SharedTable.objects.filter(
-                file__relative_key__contains=uuid,
-                user=request.user.pk,
-                permissions__name=models.Permissions.RENAME_ONLY).exists():
+        shared_file = permissions.get_shared_file(request, uuid, models.Permissions.RENAME_ONLY)
+        if shared_file is None:
             raise PermissionDenied(detail='You do not have permission to perform this action.')
 
-        instance = models.File.objects.filter(relative_key__contains=uuid).first()
+        instance = shared_file.file
         serializer = serializers.ShareFileUpdateSerializer(instance=instance,
                                                            data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -451,10 +434,8 @@ class SharedFileRetrieveUpdateDestroyView(APIView):
 
     def delete(self, request, uuid):
         """Delete file if permission is okay."""
-        if not models.SharedTable.objects.filter(
-                file__relative_key__contains=uuid,
-                user=request.user.pk,
-                permissions__name=models.Permissions.DELETE_ONLY).exists():
+        shared_file = permissions.get_shared_file(request, uuid, models.Permissions.DELETE_ONLY)
+        if shared_file is None:
             raise PermissionDenied(detail='You do not have permission to perform this action.')
 
         try:
@@ -473,10 +454,7 @@ class ListSharedFilesView(generics.ListAPIView):
     serializer_class = serializers.RetrieveListSharedFilesSerializer
 
     def get_queryset(self):
-        return models.SharedTable.objects.filter(
-            user=self.request.user,
-            created_at__lt=F('expired')
-        )
+        return models.SharedTable.objects.active().filter(user=self.request.user)
 
 
 class CreateThumbnailView(APIView):
@@ -489,7 +467,7 @@ class CreateThumbnailView(APIView):
         serializer.is_valid(raise_exception=True)
 
         thumbnail_key = serializer.validated_data['thumbnail_key']
-        instance = get_object_or_404(models.File, relative_key__contains=uuid)
+        instance = get_object_or_404(models.File, uuid=uuid)
         s3.check_exists(thumbnail_key)
 
         instance.thumbnail_key = thumbnail_key
@@ -508,7 +486,7 @@ class FileRetrieveUpdateDestroyView(APIView):
     def get(self, request, uuid):
         """Get download URL for a shared file."""
         if not models.File.objects.filter(
-                relative_key__contains=uuid,
+                uuid=uuid,
                 owner=request.user.pk).exists():
             raise PermissionDenied(detail='forbidden')
 
@@ -517,11 +495,11 @@ class FileRetrieveUpdateDestroyView(APIView):
     def put(self, request, uuid):
         """Rename file if permission is okay."""
         if not models.File.objects.filter(
-                relative_key__contains=uuid,
+                uuid=uuid,
                 owner=request.user.pk).exists():
             raise PermissionDenied(detail='forbidden')
 
-        instance = models.File.objects.filter(relative_key__contains=uuid).first()
+        instance = models.File.objects.filter(uuid=uuid).first()
 
         serializer = serializers.FileRetrieveUpdateDestroySerializer(instance=instance,
                                                                      data=request.data)
@@ -532,7 +510,7 @@ class FileRetrieveUpdateDestroyView(APIView):
     def delete(self, request, uuid):
         """Delete file if permission is okay."""
         if not models.File.objects.filter(
-                relative_key__contains=uuid,
+                uuid=uuid,
                 owner=request.user.pk).exists():
             raise PermissionDenied(detail='forbidden')
 
@@ -551,13 +529,29 @@ class FileRetrieveUpdateDestroyView(APIView):
 class FileListCreateView(APIView):
     authentication_classes = (BasicAuthentication,)
     permission_classes = (IsAuthenticated,)
+    keyset_ordering = ('folder_id', 'title', 'id')
+    keyset_types = ((int, None), str, int)
 
     def get(self, request):
-        files = models.File.objects.filter(owner=request.user)
-        for file in files:
-            file.relative_key = file.relative_key.split('/')[-1]
-        serializer = serializers.FileListCreateSerializer(files, many=True)
-        return Response(serializer.data)
+        """Return a page of user's files filtered by folder and extension."""
+        files = models.File.objects.filter(
+            owner=request.user,
+            is_uploaded=True
+        ).select_related('folder').only('id', 'title', 'uuid', 'folder_id', 'extension', 'size', 'folder__title')
+
+        folder_uuid = request.query_params.get('folder')
+        if folder_uuid is not None:
+            validators.validate_uuid(folder_uuid)
+            files = files.filter(folder__uuid=folder_uuid)
+
+        extension = request.query_params.get('extension')
+        if extension is not None:
+            files = files.filter(extension=extension)
+
+        paginator = pagination.KeysetPagination()
+        page = paginator.paginate_queryset(files, request, view=self)
+        serializer = serializers.FileListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         serializer = serializers.FileListCreateSerializer(data=request.data)
@@ -578,3 +572,226 @@ class FileListCreateView(APIView):
                         size=size)
 
         return Response(data=serializer.data, status=HTTP_201_CREATED)
+
+
+class FileUploadCreateView(APIView):
+    """Reserve a file and return presigned POST for direct upload to S3."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        """Create not uploaded file and sign upload form for it."""
+        serializer = serializers.FileUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        folder_uuid = serializer.validated_data.get('folder')
+        if folder_uuid is not None:
+            validators.validate_uuid(folder_uuid)
+            if not self.request.user.folders.filter(uuid=folder_uuid):
+                raise PermissionDenied(detail='You do not have permission to perform this action.')
+
+        rk = create_file_relative_key(self.request.user.pk)
+        extension = os.path.splitext(serializer.validated_data.get('title'))[1]
+        size = serializer.validated_data.get('size')
+        content_type = serializer.validated_data.get('content_type')
+
+        instance = serializer.save(owner=self.request.user,
+                                   relative_key=rk,
+                                   extension=extension)
+        presigned_post = s3.create_presigned_post(rk, extension, content_type, size)
+
+        return Response(data={'uuid': instance.uuid,
+                              'url': presigned_post['url'],
+                              'fields': presigned_post['fields']},
+                        status=HTTP_201_CREATED)
+
+
+class FileUploadCompleteView(APIView):
+    """Finalize a file uploaded directly to S3."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, uuid):
+        """Check uploaded object and mark the file as uploaded."""
+        instance = get_object_or_404(models.File, uuid=uuid, owner=request.user, is_uploaded=False)
+
+        size = s3.get_object_size(instance.relative_key)
+        if size is None:
+            raise ParseError(detail='The file was not uploaded.')
+
+        instance.size = size
+        instance.extension = os.path.splitext(instance.title)[1]
+        instance.is_uploaded = True
+        instance.save()
+
+        serializer = serializers.FileUploadCompleteSerializer(instance)
+        return Response(data=serializer.data)
+
+
+class FileUploadAbortView(APIView):
+    """Abort direct upload to S3."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def delete(self, request, uuid):
+        """Delete reserved file and its object if it was uploaded."""
+        instance = get_object_or_404(models.File,
+                                     uuid=uuid,
+                                     owner=request.user,
+                                     is_uploaded=False,
+                                     upload_id__isnull=True)
+        s3.delete_keys([instance.relative_key])
+        instance.delete()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class StorageUsageView(APIView):
+    """Storage usage and quota of the user."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        """Return used size, file count and quota."""
+        usage = models.StorageUsage.objects.filter(user=request.user).first()
+        if usage is None:
+            usage = models.StorageUsage(user=request.user)
+        return Response(serializers.StorageUsageSerializer(usage).data)
+
+
+class SearchView(APIView):
+    """Search of user's files and folders by title."""
+
+    permission_classes = (IsAuthenticated,)
+    keyset_ordering = ('rank', 'is_folder', 'id')
+    keyset_types = ((float, int), bool, int)
+
+    def get(self, request):
+        """Return a page of files and folders ranked by similarity of title to 'q'."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ParseError(detail='Query parameter q is required.')
+        if len(query) > 255:
+            raise ParseError(detail='Query is too long.')
+
+        path = None
+        folder_uuid = request.query_params.get('folder')
+        if folder_uuid is not None:
+            validators.validate_uuid(folder_uuid)
+            path = get_object_or_404(models.Folder, uuid=folder_uuid, owner=request.user).path
+
+        paginator = pagination.KeysetPagination()
+        rows = paginator.paginate_rows(
+            lambda after, limit: queries.search_assets(query, request.user.pk, path, after, limit),
+            request, view=self
+        )
+        serializer = serializers.SearchResultSerializer(rows, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+def get_multipart_file(request, uuid):
+    """Return file with multipart upload in progress owned by the user."""
+    return get_object_or_404(models.File,
+                             uuid=uuid,
+                             owner=request.user,
+                             is_uploaded=False,
+                             upload_id__isnull=False)
+
+
+class MultipartUploadCreateView(APIView):
+    """Reserve a file and start multipart upload to S3."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        """Create not uploaded file and multipart upload for it."""
+        serializer = serializers.MultipartUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        folder_uuid = serializer.validated_data.get('folder')
+        if folder_uuid is not None:
+            validators.validate_uuid(folder_uuid)
+            if not self.request.user.folders.filter(uuid=folder_uuid):
+                raise PermissionDenied(detail='You do not have permission to perform this action.')
+
+        rk = create_file_relative_key(self.request.user.pk)
+        extension = os.path.splitext(serializer.validated_data.get('title'))[1]
+        content_type = serializer.validated_data.get('content_type')
+
+        with transaction.atomic():
+            instance = serializer.save(owner=self.request.user,
+                                       relative_key=rk,
+                                       extension=extension)
+            instance.upload_id = s3.create_multipart_upload(rk, extension, content_type)
+            instance.save(update_fields=['upload_id'])
+
+        return Response(data={'uuid': instance.uuid}, status=HTTP_201_CREATED)
+
+
+class MultipartUploadAbortView(APIView):
+    """Abort multipart upload."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def delete(self, request, uuid):
+        """Abort multipart upload and delete reserved file."""
+        instance = get_multipart_file(request, uuid)
+        s3.abort_multipart_upload(instance.relative_key, instance.upload_id)
+        instance.delete()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MultipartUploadPartsView(APIView):
+    """List uploaded parts and sign URLs for the next ones."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, uuid):
+        """Return already uploaded parts to resume upload."""
+        instance = get_multipart_file(request, uuid)
+        return Response({'parts': s3.list_parts(instance.relative_key, instance.upload_id)})
+
+    def post(self, request, uuid):
+        """Return presigned URLs for upload of the parts."""
+        instance = get_multipart_file(request, uuid)
+        serializer = serializers.UploadPartsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        urls = s3.get_upload_part_urls(instance.relative_key,
+                                       instance.upload_id,
+                                       serializer.validated_data['part_numbers'])
+        return Response({'urls': urls})
+
+
+class MultipartUploadCompleteView(APIView):
+    """Finalize multipart upload."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, uuid):
+        """Assemble uploaded parts and mark the file as uploaded."""
+        instance = get_multipart_file(request, uuid)
+
+        parts = s3.list_parts(instance.relative_key, instance.upload_id)
+        if not parts:
+            raise ParseError(detail='No parts of the file were uploaded.')
+
+        size = sum(part['size'] for part in parts)
+        if size > instance.size:
+            s3.abort_multipart_upload(instance.relative_key, instance.upload_id)
+            instance.delete()
+            raise ParseError(detail='Uploaded parts exceed the reserved size.')
+        error_code = s3.complete_multipart_upload(instance.relative_key, instance.upload_id, parts)
+        if error_code == 'NoSuchUpload':
+            instance.delete()
+            raise ParseError(detail='Multipart upload does not exist.')
+        if error_code is not None:
+            raise ParseError(detail=f'Uploaded parts cannot be assembled: {error_code}.')
+
+        instance.size = size
+        instance.extension = os.path.splitext(instance.title)[1]
+        instance.is_uploaded = True
+        instance.upload_id = None
+        instance.save()
+
+        serializer = serializers.FileUploadCompleteSerializer(instance)
+        return Response(data=serializer.data)
@@ -15,6 +15,10 @@ class Schedules(enum.Enum):
 
 
 celery_app = Celery('tasks', broker=os.getenv('BROKER_URL'))
+# Delayed report tasks must not be redelivered before their countdown ends.
+celery_app.conf.broker_transport_options = {
+    'visibility_timeout': int(os.getenv('BROKER_VISIBILITY_TIMEOUT', 12 * 3600)),
+}
 
 celery_app.conf.beat_schedule = {
     'daily': {
@@ -32,4 +36,16 @@ celery_app.conf.beat_schedule = {
         'schedule': crontab(minute=0, hour=0, day_of_month='1'),
         'args': (Schedules.monthly.value,)
     },
+    'stale-multipart-uploads': {
+        'task': 'tasks.reap_stale_multipart_uploads',
+        'schedule': crontab(minute=30),
+    },
+    'stale-reserved-uploads': {
+        'task': 'tasks.reap_stale_reserved_uploads',
+        'schedule': crontab(minute=45),
+    },
+    'expired-shares': {
+        'task': 'tasks.purge_expired_shares',
+        'schedule': crontab(minute=0),
+    },
 }
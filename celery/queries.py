@@ -1,29 +1,112 @@
 """Module containing functions for interaction with database."""
 
 from contextlib import contextmanager
+import datetime
 import logging
 import os
+import random
+import threading
 
-from typing import List, Tuple
+from typing import Iterator, List, Optional, Tuple
 
-from celery_settings import celery_app
+from celery.signals import worker_process_init, worker_process_shutdown
 import psycopg2
 from psycopg2.extensions import cursor
+from psycopg2.pool import ThreadedConnectionPool
 
 logger = logging.getLogger(__name__)
 
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_replica_hosts() -> List[Tuple[str, str]]:
+    """
+    Get hosts and ports of read replicas from DB_REPLICA_HOSTS.
+
+    Returns:
+        (list): List of tuples containing host and port, e.g. [('replica', '5432')].
+
+    """
+    hosts = []
+    for replica in filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')):
+        host, _, port = replica.strip().partition(':')
+        hosts.append((host, port or os.getenv('DB_PORT')))
+    return hosts
+
+
+def get_pool(host: str, port: str) -> ThreadedConnectionPool:
+    """
+    Get the connection pool of the worker process for the database host.
+
+    Pools are created lazily and shared by all tasks of the process.
+
+    Args:
+        host: Database host.
+        port: Database port.
+
+    Returns:
+        ThreadedConnectionPool object.
+
+    """
+    pool = _pools.get((host, port))
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get((host, port))
+            if pool is None:
+                pool = ThreadedConnectionPool(
+                    int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+                    int(os.getenv('DB_POOL_MAX_SIZE', 5)),
+                    user=os.getenv('DB_USER'),
+                    password=os.getenv('DB_PASSWORD'),
+                    database=os.getenv('DB_NAME'),
+                    host=host,
+                    port=port)
+                _pools[(host, port)] = pool
+    return pool
+
+
+@worker_process_init.connect
+def init_pools(**kwargs) -> None:
+    """Drop pools inherited from the parent process and open the primary one."""
+    _pools.clear()
+    get_pool(os.getenv('DB_HOST'), os.getenv('DB_PORT'))
+
+
+@worker_process_shutdown.connect
+def close_pools(**kwargs) -> None:
+    """Close all connections of the worker process."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
+
 
 @contextmanager
-def get_cursor() -> cursor:
-    """Return the cursor generator for database access."""
-    with psycopg2.connect(
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_NAME'),
-            host=os.getenv('DB_HOST'),
-            port=os.getenv('DB_PORT')) as conn:
-        with conn.cursor() as db_cursor:
-            yield db_cursor
+def get_cursor(readonly: bool = False, name: Optional[str] = None) -> cursor:
+    """
+    Return the cursor generator for database access.
+
+    The connection is taken from the pool of the worker process and returned
+    after commit or rollback, broken connections are discarded.
+
+    Args:
+        readonly: Use a random read replica if any is configured.
+        name: Name of a server-side cursor which fetches rows by DB_CURSOR_ITERSIZE.
+
+    """
+    replica_hosts = get_replica_hosts() if readonly else []
+    host, port = random.choice(replica_hosts) if replica_hosts else (os.getenv('DB_HOST'), os.getenv('DB_PORT'))
+    pool = get_pool(host, port)
+    conn = pool.getconn()
+    try:
+        with conn:
+            with conn.cursor(name=name) as db_cursor:
+                if name is not None:
+                    db_cursor.itersize = int(os.getenv('DB_CURSOR_ITERSIZE', 2000))
+                yield db_cursor
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
 
 
 def get_schedule_subscribers(schedule_id: int) -> List[int]:
@@ -37,7 +120,7 @@ def get_schedule_subscribers(schedule_id: int) -> List[int]:
         (list): List containing user_id, e.g. [5, 1].
 
     """
-    with get_cursor() as db_cursor:
+    with get_cursor(readonly=True) as db_cursor:
         query = """
             SELECT user_id
               FROM assets_reportsubscribers
@@ -47,28 +130,281 @@ def get_schedule_subscribers(schedule_id: int) -> List[int]:
         return [user[0] for user in db_cursor.fetchall()]
 
 
-@celery_app.task
-def get_rows(user_id: int) -> List[Tuple[str, int]]:
+SIZE_BUCKETS = (
+    (1024, '< 1 KB'),
+    (1024 ** 2, '1 KB - 1 MB'),
+    (100 * 1024 ** 2, '1 MB - 100 MB'),
+    (1024 ** 3, '100 MB - 1 GB'),
+    (None, '>= 1 GB'),
+)
+
+
+def iter_report_rows(schedule_id: int, user_ids: List[int]) -> Iterator[tuple]:
+    """
+    Stream rows of all report sheets for a chunk of subscribers from one query.
+
+    Files of the chunk are scanned once for the size histogram, the largest
+    files and the growth by month in UTC; extension and folder sheets are
+    read from maintained aggregates. Rows are fetched by a server-side
+    cursor, so memory does not depend on the number of rows.
+
+    Args:
+        schedule_id: Schedule identifier the users are subscribed to.
+        user_ids: Chunk of user identifiers from database.
+
+    Returns:
+        (iterator): Tuples containing user_id, sheet index, position in sheet and values
+            ordered by user_id, sheet and position, e.g. (5, 0, 1, '.jpg', 5, None, None).
+
+    """
+    query = """
+              WITH subscribers AS (
+                   SELECT DISTINCT user_id
+                     FROM assets_reportsubscribers
+                    WHERE schedule_id = %(schedule_id)s
+                      AND user_id = ANY(%(user_ids)s)
+              ), files AS (
+                   SELECT owner_id, title, size, created_at
+                     FROM assets_file
+                    WHERE owner_id IN (SELECT user_id FROM subscribers)
+                      AND is_uploaded
+              ), extensions AS (
+                   SELECT owner_id, extension, count, total_bytes
+                     FROM assets_fileextensionstats
+                    WHERE owner_id IN (SELECT user_id FROM subscribers)
+                      AND count > 0
+              ), largest AS (
+                   SELECT owner_id, title, size,
+                          row_number() OVER (PARTITION BY owner_id ORDER BY size DESC, title) AS position
+                     FROM files
+              ), folders AS (
+                   SELECT owner_id, title, total_size, file_count,
+                          row_number() OVER (PARTITION BY owner_id ORDER BY total_size DESC, id) AS position
+                     FROM assets_folder
+                    WHERE owner_id IN (SELECT user_id FROM subscribers)
+              ), growth AS (
+                   SELECT owner_id, date_trunc('month', created_at AT TIME ZONE 'UTC') AS month,
+                          count(*) AS count, sum(size)::bigint AS size
+                     FROM files
+                 GROUP BY owner_id, date_trunc('month', created_at AT TIME ZONE 'UTC')
+              )
+            SELECT owner_id, 0 AS sheet, row_number() OVER (PARTITION BY owner_id ORDER BY extension) AS position,
+                   extension AS label, count::bigint AS value, NULL::bigint AS value_2, NULL::bigint AS value_3
+              FROM extensions
+         UNION ALL
+            SELECT owner_id, 1, row_number() OVER (PARTITION BY owner_id ORDER BY total_bytes DESC, extension),
+                   extension, total_bytes, NULL, NULL
+              FROM extensions
+         UNION ALL
+            SELECT owner_id, 2, width_bucket(size, %(bucket_bounds)s::bigint[]),
+                   (%(bucket_labels)s::text[])[width_bucket(size, %(bucket_bounds)s::bigint[]) + 1],
+                   count(*), sum(size)::bigint, NULL
+              FROM files
+          GROUP BY owner_id, width_bucket(size, %(bucket_bounds)s::bigint[])
+         UNION ALL
+            SELECT owner_id, 3, position, title, size, NULL, NULL
+              FROM largest
+             WHERE position <= %(top_size)s
+         UNION ALL
+            SELECT owner_id, 4, position, title, total_size, file_count, NULL
+              FROM folders
+             WHERE position <= %(top_size)s
+         UNION ALL
+            SELECT owner_id, 5, row_number() OVER (PARTITION BY owner_id ORDER BY month NULLS FIRST),
+                   COALESCE(to_char(month, 'YYYY-MM'), 'Unknown'), count, size,
+                   sum(size) OVER (PARTITION BY owner_id ORDER BY month NULLS FIRST)::bigint
+              FROM growth
+          ORDER BY owner_id, sheet, position;
+    """
+    params = {'schedule_id': schedule_id, 'user_ids': list(user_ids),
+              'bucket_bounds': [bound for bound, _ in SIZE_BUCKETS if bound is not None],
+              'bucket_labels': [label for _, label in SIZE_BUCKETS],
+              'top_size': int(os.getenv('REPORT_TOP_SIZE', 10))}
+    with get_cursor(readonly=True, name='report_rows') as db_cursor:
+        try:
+            db_cursor.execute(query, params)
+            yield from db_cursor
+        except psycopg2.Error as error:
+            logger.error(f'Postgres error: {error}')
+            raise error
+
+
+def create_report_run(schedule_id: int, total_users: int, total_chunks: int) -> int:
+    """
+    Create a record tracking progress of a reports run.
+
+    Args:
+        schedule_id: Schedule identifier of the run.
+        total_users: Number of subscribers in the run.
+        total_chunks: Number of chunks the subscribers are split into.
+
+    Returns:
+        (int): Identifier of the run.
+
+    """
+    query = """
+            INSERT INTO assets_reportrun (schedule_id, started_at, total_users, total_chunks,
+                                          done_chunks, done_chunk_indexes, done_users, failed_users)
+            VALUES (%(schedule_id)s, now(), %(total_users)s, %(total_chunks)s, 0, '{}', 0, 0)
+         RETURNING id;
+    """
+    with get_cursor() as db_cursor:
+        try:
+            db_cursor.execute(query, {'schedule_id': schedule_id, 'total_users': total_users,
+                                      'total_chunks': total_chunks})
+            return db_cursor.fetchone()[0]
+        except psycopg2.Error as error:
+            logger.error(f'Postgres error: {error}')
+            raise error
+
+
+def complete_report_chunk(run_id: int, chunk_index: Optional[int], done_users: int, failed_users: int) -> None:
+    """
+    Add a completed chunk to progress of the reports run and finish the run after the last one.
+
+    A chunk is counted once, so a redelivered task does not add it again.
+
+    Args:
+        run_id: Identifier of the run.
+        chunk_index: Index of the chunk in the run, None for tasks sent without it.
+        done_users: Number of users in the chunk.
+        failed_users: Number of users whose reports were not uploaded.
+
+    """
+    query = """
+            UPDATE assets_reportrun
+               SET done_chunks = done_chunks + 1,
+                   done_chunk_indexes = done_chunk_indexes || %(chunk_indexes)s::integer[],
+                   done_users = done_users + %(done_users)s,
+                   failed_users = failed_users + %(failed_users)s,
+                   finished_at = CASE WHEN done_chunks + 1 >= total_chunks THEN now() END
+             WHERE id = %(run_id)s
+               AND done_chunks < total_chunks
+               AND NOT done_chunk_indexes && %(chunk_indexes)s::integer[];
+    """
+    params = {'run_id': run_id, 'chunk_indexes': [] if chunk_index is None else [chunk_index],
+              'done_users': done_users, 'failed_users': failed_users}
+    with get_cursor() as db_cursor:
+        try:
+            db_cursor.execute(query, params)
+        except psycopg2.Error as error:
+            logger.error(f'Postgres error: {error}')
+            raise error
+
+
+def delete_not_uploaded_files(keys: List[str]) -> int:
+    """
+    Delete reserved files which were not uploaded with their shares and release their storage usage.
+
+    Args:
+        keys: Relative keys of files.
+
+    Returns:
+        (int): Number of deleted files.
+
+    """
+    if not keys:
+        return 0
+
+    query = """
+              WITH files AS (
+                   SELECT id
+                     FROM assets_file
+                    WHERE relative_key = ANY(%(keys)s)
+                      AND NOT is_uploaded
+              ), shares AS (
+                   DELETE FROM assets_sharedtable
+                    WHERE file_id IN (SELECT id FROM files)
+              ), deleted AS (
+                   DELETE FROM assets_file
+                    WHERE id IN (SELECT id FROM files)
+                RETURNING owner_id, size
+              ), usage AS (
+                   UPDATE assets_storageusage
+                      SET used_size = used_size - owner_files.size,
+                          file_count = file_count - owner_files.count
+                     FROM (SELECT owner_id, sum(size) AS size, count(*) AS count
+                             FROM deleted
+                         GROUP BY owner_id) AS owner_files
+                    WHERE assets_storageusage.user_id = owner_files.owner_id
+              )
+            SELECT count(*)
+              FROM deleted;
+    """
+    with get_cursor() as db_cursor:
+        try:
+            db_cursor.execute(query, {'keys': keys})
+            return db_cursor.fetchone()[0]
+        except psycopg2.Error as error:
+            logger.error(f'Postgres error: {error}')
+            raise error
+
+
+def delete_stale_reserved_files(max_age: datetime.timedelta) -> List[str]:
+    """
+    Delete files reserved for presigned POST upload earlier than max_age ago and release their storage usage.
+
+    Args:
+        max_age: Age of reservation after which it is considered abandoned.
+
+    Returns:
+        (list): Relative keys of deleted files.
+
+    """
+    query = """
+              WITH deleted AS (
+                   DELETE FROM assets_file
+                    WHERE NOT is_uploaded
+                      AND upload_id IS NULL
+                      AND created_at < now() - %(max_age)s
+                      AND NOT EXISTS (SELECT 1
+                                        FROM assets_sharedtable
+                                       WHERE assets_sharedtable.file_id = assets_file.id)
+                RETURNING owner_id, size, relative_key
+              ), usage AS (
+                   UPDATE assets_storageusage
+                      SET used_size = used_size - owner_files.size,
+                          file_count = file_count - owner_files.count
+                     FROM (SELECT owner_id, sum(size) AS size, count(*) AS count
+                             FROM deleted
+                         GROUP BY owner_id) AS owner_files
+                    WHERE assets_storageusage.user_id = owner_files.owner_id
+              )
+            SELECT relative_key
+              FROM deleted;
+    """
+    with get_cursor() as db_cursor:
+        try:
+            db_cursor.execute(query, {'max_age': max_age})
+            return [row[0] for row in db_cursor.fetchall()]
+        except psycopg2.Error as error:
+            logger.error(f'Postgres error: {error}')
+            raise error
+
+
+def delete_expired_shares(batch_size: int) -> int:
     """
-    Receive a list of file extensions with their number for a particular user.
+    Delete a batch of expired shares.
 
     Args:
-        user_id: User identifier from database.
+        batch_size: Maximum number of shares to delete.
 
     Returns:
-        (list): List of tuples containing file's extensions and count, e.g [('.jpg', 5), ('.exe', 2)].
+        (int): Number of deleted shares.
 
     """
     query = """
-            SELECT extension, count(extension)
-              FROM assets_file
-             WHERE owner_id = %(user_id)s
-          GROUP BY extension;
+            DELETE FROM assets_sharedtable
+             WHERE id IN (SELECT id
+                            FROM assets_sharedtable
+                           WHERE expired <= now()
+                           LIMIT %(batch_size)s
+                             FOR UPDATE SKIP LOCKED);
     """
     with get_cursor() as db_cursor:
         try:
-            db_cursor.execute(query, {'user_id': user_id})
-            return db_cursor.fetchall()
+            db_cursor.execute(query, {'batch_size': batch_size})
+            return db_cursor.rowcount
         except psycopg2.Error as error:
             logger.error(f'Postgres error: {error}')
             raise error
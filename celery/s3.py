@@ -3,41 +3,97 @@
 import datetime
 import logging
 import os
-from typing import BinaryIO
+import threading
+from typing import Any, BinaryIO, Dict, List
 
 import boto3
 from boto3.resources.factory import ServiceResource
+from boto3.s3.transfer import TransferConfig
+from botocore.client import BaseClient
 from botocore.config import Config
 from botocore.exceptions import ClientError
 
-from celery_settings import celery_app
-
 logger = logging.getLogger(__name__)
 
+_client = None
+_client_lock = threading.Lock()
+_local = threading.local()
 
-def get_bucket() -> ServiceResource:
+
+def get_client_options() -> Dict[str, Any]:
     """
-    Get the bucket from S3 with boto3.
+    Get credentials and config of S3 clients.
 
     Returns:
-        S3 Bucket object.
+        Keyword arguments for creating a client or resource.
     """
-    credentials = {
+    config = Config(signature_version=os.getenv('AWS_SIGNATURE_VERSION'),
+                    region_name=os.getenv('AWS_REGION'),
+                    max_pool_connections=int(os.getenv('AWS_S3_MAX_POOL_CONNECTIONS', 10)),
+                    connect_timeout=int(os.getenv('AWS_S3_CONNECT_TIMEOUT', 60)),
+                    read_timeout=int(os.getenv('AWS_S3_READ_TIMEOUT', 60)),
+                    retries={'max_attempts': int(os.getenv('AWS_S3_MAX_ATTEMPTS', 3)),
+                             'mode': os.getenv('AWS_S3_RETRY_MODE', 'standard')})
+    return {
         'aws_access_key_id': os.getenv('AWS_KEY'),
-        'aws_secret_access_key': os.getenv('AWS_SECRET_KEY')
+        'aws_secret_access_key': os.getenv('AWS_SECRET_KEY'),
+        'config': config,
     }
-    config = Config(signature_version=os.getenv('AWS_SIGNATURE_VERSION'),
-                    region_name=os.getenv('AWS_REGION'))
 
-    return boto3.resource('s3', **credentials, config=config).Bucket(
-        name=os.getenv('S3_BUCKET'))
+
+def get_client() -> BaseClient:
+    """
+    Get the S3 client shared by all threads.
+
+    Clients are thread-safe, so the process creates one under a lock. It is
+    created lazily, so each forked worker builds its own client and pool of
+    connections, which are reused by all tasks of the worker.
+
+    Returns:
+        S3 client object.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = boto3.session.Session().client('s3', **get_client_options())
+    return _client
+
+
+def get_resource() -> ServiceResource:
+    """
+    Get the S3 resource of the current thread.
+
+    Resources are not thread-safe, so each thread gets its own one. It sends
+    requests through the shared client instead of opening its own pool.
+
+    Returns:
+        S3 ServiceResource object.
+    """
+    resource = getattr(_local, 'resource', None)
+    if resource is None:
+        resource = _local.resource = boto3.session.Session().resource('s3', **get_client_options())
+        resource.meta.client = get_client()
+    return resource
+
+
+def get_bucket() -> ServiceResource:
+    """
+    Get the bucket from S3 with boto3.
+
+    Returns:
+        S3 Bucket object.
+    """
+    return get_resource().Bucket(name=os.getenv('S3_BUCKET'))
 
 
-@celery_app.task
 def upload_excel_to_bucket(data: BinaryIO, user: int) -> None:
     """
     Generate key for s3 bucket and upload report.
 
+    Large reports are uploaded by parts of REPORT_UPLOAD_PART_SIZE bytes
+    read from the file.
+
     Args:
         data: Excel file.
         user: User identifier from db.
@@ -45,12 +101,59 @@ def upload_excel_to_bucket(data: BinaryIO, user: int) -> None:
     bucket = get_bucket()
     now = datetime.datetime.now()
     key = f'reports/{user}/{now}.xls'
+    part_size = int(os.getenv('REPORT_UPLOAD_PART_SIZE', 8 * 1024 ** 2))
+    config = TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size)
 
     try:
-        bucket.put_object(Body=data,
-                          Bucket=bucket.name,
-                          Key=key, )
+        bucket.upload_fileobj(data, key, Config=config)
 
     except ClientError as error:
         logger.error(f'user_id: {user}. Error while upload report.')
         raise error
+
+
+def abort_stale_multipart_uploads(max_age: datetime.timedelta) -> List[str]:
+    """
+    Abort multipart uploads of users' files started earlier than max_age ago.
+
+    Args:
+        max_age: Age of upload after which it is considered stale.
+
+    Returns:
+        (list): Keys of aborted uploads.
+    """
+    bucket = get_bucket()
+    client = bucket.meta.client
+    stale_before = datetime.datetime.now(datetime.timezone.utc) - max_age
+    keys = []
+
+    paginator = client.get_paginator('list_multipart_uploads')
+    for page in paginator.paginate(Bucket=bucket.name, Prefix='users/'):
+        for upload in page.get('Uploads', []):
+            if upload['Initiated'] >= stale_before:
+                continue
+            try:
+                client.abort_multipart_upload(Bucket=bucket.name,
+                                              Key=upload['Key'],
+                                              UploadId=upload['UploadId'])
+            except ClientError as error:
+                logger.error(f'key: {upload["Key"]}. Error while abort multipart upload. {error}')
+            else:
+                keys.append(upload['Key'])
+    return keys
+
+
+def delete_keys(keys: List[str]) -> None:
+    """
+    Delete objects from the bucket in batches of DeleteObjects limit.
+
+    Args:
+        keys: Keys of objects, missing ones are ignored.
+    """
+    bucket = get_bucket()
+    for start in range(0, len(keys), 1000):
+        try:
+            bucket.delete_objects(Delete={'Objects': [{'Key': key} for key in keys[start:start + 1000]],
+                                          'Quiet': True})
+        except ClientError as error:
+            logger.error(f'Error while deleting objects. {error}')
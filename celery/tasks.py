@@ -1,13 +1,19 @@
 """Module containing Celery tasks."""
 
+import datetime
 import logging
-
-from celery import chain
+import os
+import random
 
 from celery_settings import celery_app
+from queries import create_report_run
+from queries import delete_expired_shares
+from queries import delete_not_uploaded_files
+from queries import delete_stale_reserved_files
 from queries import get_schedule_subscribers
-from queries import get_rows
-from utils import create_excel_file
+from s3 import abort_stale_multipart_uploads
+from s3 import delete_keys
+from utils import create_reports
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +21,14 @@ logger = logging.getLogger(__name__)
 @celery_app.task
 def get_subscribed_users(schedule_id: int) -> None:
     """
-    Task to receive a report and send it to the bucket on a periodicity basis.
+    Task to receive reports and send them to the bucket on a periodicity basis.
+
+    Subscribers are split into chunks of REPORT_CHUNK_SIZE users, reports of
+    a chunk are generated by one task. Chunks are spread evenly over
+    REPORT_WINDOW_SECONDS with random REPORT_JITTER_SECONDS delay, so the
+    database and S3 get a flat load. Tasks are sent to REPORT_QUEUE if it
+    is set, its workers limit concurrency. Progress is tracked in a
+    report run record.
 
     Args:
         schedule_id: Schedule ID to get users with.
@@ -28,8 +41,71 @@ def get_subscribed_users(schedule_id: int) -> None:
 
     if not users:
         message = 'No users for monthly reports.'
-        logger.INFO(message)
+        logger.info(message)
         return
 
-    for user in users:
-        chain(get_rows.s(user) | create_excel_file.s(user)).apply_async()
+    chunk_size = int(os.getenv('REPORT_CHUNK_SIZE', 1000))
+    window = int(os.getenv('REPORT_WINDOW_SECONDS', 3600))
+    jitter = int(os.getenv('REPORT_JITTER_SECONDS', 60))
+    chunks = [users[start:start + chunk_size] for start in range(0, len(users), chunk_size)]
+    run_id = create_report_run(schedule_id, len(users), len(chunks))
+
+    for index, chunk in enumerate(chunks):
+        countdown = index * window / len(chunks) + random.uniform(0, jitter)
+        create_reports.apply_async((schedule_id, chunk, run_id, index), countdown=countdown,
+                                   queue=os.getenv('REPORT_QUEUE'))
+    logger.info(f'Report run {run_id}: {len(users)} users in {len(chunks)} chunks over {window} seconds.')
+
+
+@celery_app.task
+def reap_stale_multipart_uploads() -> int:
+    """
+    Task to abort stale multipart uploads and delete their reserved files.
+
+    Returns:
+        (int): Number of deleted files.
+
+    """
+    max_age = datetime.timedelta(hours=int(os.getenv('MULTIPART_UPLOAD_MAX_AGE_HOURS', 24)))
+    keys = abort_stale_multipart_uploads(max_age)
+    deleted = delete_not_uploaded_files(keys)
+    logger.info(f'Aborted {len(keys)} stale multipart uploads, deleted {deleted} files.')
+    return deleted
+
+
+@celery_app.task
+def reap_stale_reserved_uploads() -> int:
+    """
+    Task to delete files reserved for presigned POST upload which were never completed.
+
+    Returns:
+        (int): Number of deleted files.
+
+    """
+    max_age = datetime.timedelta(hours=int(os.getenv('RESERVED_UPLOAD_MAX_AGE_HOURS', 24)))
+    keys = delete_stale_reserved_files(max_age)
+    delete_keys(keys)
+    logger.info(f'Deleted {len(keys)} stale reserved files.')
+    return len(keys)
+
+
+@celery_app.task
+def purge_expired_shares() -> int:
+    """
+    Task to delete expired shares in batches.
+
+    Every batch is committed separately, so locks are held only for a batch.
+
+    Returns:
+        (int): Number of deleted shares.
+
+    """
+    batch_size = int(os.getenv('EXPIRED_SHARES_BATCH_SIZE', 1000))
+    total = 0
+    while True:
+        deleted = delete_expired_shares(batch_size)
+        total += deleted
+        if deleted < batch_size:
+            break
+    logger.info(f'Deleted {total} expired shares.')
+    return total
@@ -1,28 +1,124 @@
 """Module containing auxiliary functions."""
 
-import io
+import itertools
+import json
+import logging
+from operator import itemgetter
+import os
+import tempfile
+from typing import Iterable, List, Optional
 
+from botocore.exceptions import ClientError
 import xlsxwriter
 
 from celery_settings import celery_app
+from queries import complete_report_chunk
+from queries import iter_report_rows
 from s3 import upload_excel_to_bucket
 
+logger = logging.getLogger(__name__)
 
-@celery_app.task
-def create_excel_file(rows: list, user_id: int) -> None:
+
+REPORT_SHEETS = (
+    ('Extensions', ('Extension', 'Files')),
+    ('Bytes by extension', ('Extension', 'Bytes')),
+    ('Size histogram', ('Size', 'Files', 'Bytes')),
+    ('Largest files', ('File', 'Bytes')),
+    ('Folders', ('Folder', 'Bytes', 'Files')),
+    ('Growth', ('Month', 'Files', 'Bytes', 'Total bytes')),
+)
+
+
+def create_excel_file(rows: Iterable[tuple], user_id: int) -> None:
     """
-    Generate excel file and call upload_excel_to_bucket() to upload it.
+    Generate excel file on disk and call upload_excel_to_bucket() to upload it.
+
+    Rows are written in constant memory mode, so only the current row is
+    kept in memory.
 
     Args:
-        rows: List of tuples containing file's extension and counts.
+        rows: Iterable of tuples containing index of sheet in REPORT_SHEETS, position in the sheet and values.
         user_id: User's identifier from database to send it to upload_excel_to_bucket() function.
     """
-    with io.BytesIO() as output_file:
-        workbook = xlsxwriter.Workbook(output_file, {'in_memory': True})
-        worksheet = workbook.add_worksheet()
-        for index, values in enumerate(rows):
-            worksheet.write_row(row=index, col=0, data=values)
+    with tempfile.TemporaryFile() as output_file:
+        workbook = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+        worksheets = []
+        for title, header in REPORT_SHEETS:
+            worksheet = workbook.add_worksheet(title)
+            worksheet.write_row(row=0, col=0, data=header)
+            worksheets.append(worksheet)
+
+        row_indexes = [1] * len(REPORT_SHEETS)
+        for sheet, _, *values in rows:
+            header = REPORT_SHEETS[sheet][1]
+            worksheets[sheet].write_row(row=row_indexes[sheet], col=0, data=values[:len(header)])
+            row_indexes[sheet] += 1
 
         workbook.close()
         output_file.seek(0)
         upload_excel_to_bucket(output_file, user_id)
+
+
+def create_chunk_reports(schedule_id: int, user_ids: List[int]) -> int:
+    """
+    Generate and upload excel files for users of a chunk.
+
+    Rows of all users are streamed from one query into a temporary file, so
+    the cursor and its transaction are closed before reports are uploaded.
+    A failed upload is logged and does not stop reports of other users.
+
+    Args:
+        schedule_id: Schedule identifier the users are subscribed to.
+        user_ids: Sorted user identifiers from database.
+
+    Returns:
+        (int): Number of users whose reports were not uploaded.
+    """
+    failed = 0
+    with tempfile.TemporaryFile('w+') as spool:
+        for row in iter_report_rows(schedule_id, user_ids):
+            spool.write(json.dumps(row) + '\n')
+        spool.seek(0)
+
+        rows = (json.loads(line) for line in spool)
+        groups = itertools.groupby(rows, key=itemgetter(0))
+        group = next(groups, None)
+        for user_id in user_ids:
+            has_rows = group is not None and group[0] == user_id
+            try:
+                create_excel_file((row[1:] for row in group[1]) if has_rows else (), user_id)
+            except ClientError:
+                logger.exception(f'user_id: {user_id}. Report was not uploaded.')
+                failed += 1
+            if has_rows:
+                group = next(groups, None)
+    return failed
+
+
+@celery_app.task(rate_limit=os.getenv('REPORT_RATE_LIMIT'))
+def create_reports(schedule_id: int, user_ids: List[int], run_id: Optional[int] = None,
+                   chunk_index: Optional[int] = None) -> int:
+    """
+    Generate and upload excel files for a chunk of users.
+
+    REPORT_RATE_LIMIT limits how many chunks a worker starts, e.g. '10/m'.
+    The chunk is added to progress of the run even if it fails, all its
+    users are counted as failed then.
+
+    Args:
+        schedule_id: Schedule identifier the users are subscribed to.
+        user_ids: Chunk of user identifiers from database.
+        run_id: Identifier of the reports run to add the chunk to its progress.
+        chunk_index: Index of the chunk in the run.
+
+    Returns:
+        (int): Number of users whose reports were not uploaded.
+    """
+    user_ids = sorted(set(user_ids))
+    failed = len(user_ids)
+    try:
+        failed = create_chunk_reports(schedule_id, user_ids)
+    finally:
+        if run_id is not None:
+            complete_report_chunk(run_id, chunk_index, len(user_ids), failed)
+    return failed
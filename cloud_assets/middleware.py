@@ -0,0 +1,139 @@
+"""Middlewares for cloud_assets project."""
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.utils.crypto import constant_time_compare
+
+from cloud_assets import routers
+
+logger = logging.getLogger(__name__)
+
+
+def get_sample_rate():
+    """Return share of requests to profile.
+
+    The switch file overrides PROFILER_SAMPLE_RATE at runtime, it contains
+    the rate or nothing for profiling every request.
+    """
+    try:
+        with open(settings.PROFILER_SWITCH_FILE) as switch_file:
+            content = switch_file.read().strip()
+    except OSError:
+        return settings.PROFILER_SAMPLE_RATE
+
+    try:
+        return float(content) if content else 1.0
+    except ValueError:
+        logger.warning(f'Invalid sample rate in profiler switch file: {content}')
+        return settings.PROFILER_SAMPLE_RATE
+
+
+class ProfilerMiddleware:
+    """Profile sampled requests and requests with a profiler header.
+
+    Stats are written to PROFILER_DIR which keeps at most PROFILER_MAX_FILES
+    newest files.
+    """
+
+    def __init__(self, get_response):
+        """Set up the middleware."""
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILER_SAMPLE_RATE
+        self.sample_rate_checked_at = None
+
+    def __call__(self, request):
+        """Profile the request if it is selected."""
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return self.get_response(request)
+        finally:
+            profile.disable()
+            self.dump_stats(profile, request)
+
+    def should_profile(self, request):
+        """Return True if request has the profiler header or is sampled."""
+        token = request.META.get('HTTP_X_PROFILE')
+        if token is not None and settings.PROFILER_TOKEN:
+            return constant_time_compare(token, settings.PROFILER_TOKEN)
+
+        now = time.monotonic()
+        if self.sample_rate_checked_at is None or \
+                now - self.sample_rate_checked_at >= settings.PROFILER_SWITCH_CHECK_INTERVAL:
+            self.sample_rate = get_sample_rate()
+            self.sample_rate_checked_at = now
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def dump_stats(self, profile, request):
+        """Write stats of the request and remove the oldest files."""
+        path = re.sub(r'[^\w-]+', '_', request.path).strip('_') or 'root'
+        file_name = f'{time.time_ns()}_{request.method}_{path[:100]}.prof'
+        try:
+            os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+            profile.dump_stats(os.path.join(settings.PROFILER_DIR, file_name))
+
+            file_names = sorted(name for name in os.listdir(settings.PROFILER_DIR) if name.endswith('.prof'))
+            for name in file_names[:-settings.PROFILER_MAX_FILES]:
+                os.remove(os.path.join(settings.PROFILER_DIR, name))
+        except OSError as e:
+            logger.warning(f'Profiler stats were not saved: {e}')
+
+
+class DatabaseHealthCheckMiddleware:
+    """Close persistent database connections which are broken.
+
+    Connections kept open by CONN_MAX_AGE are checked before reuse when
+    CONN_HEALTH_CHECKS of the database is set, so a request does not fail
+    after restart of the database or the pooler. New connections are not
+    checked.
+    """
+
+    def __init__(self, get_response):
+        """Set up the middleware."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Check open connections and process the request."""
+        for connection in connections.all():
+            if connection.settings_dict.get('CONN_HEALTH_CHECKS') and \
+                    connection.connection is not None and not connection.is_usable():
+                logger.warning(f'Closing broken connection to database {connection.alias}')
+                connection.close()
+        return self.get_response(request)
+
+
+class ReplicaStickinessMiddleware:
+    """Read from the primary database after writes of the client.
+
+    Unsafe requests read from the primary. A request which wrote sets a
+    cookie, so following requests of the client read from the primary for
+    DB_REPLICA_STICKY_SECONDS while replicas catch up. Writes made with
+    raw SQL on the primary connection count as well.
+    """
+
+    def __init__(self, get_response):
+        """Set up the middleware."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Pin the request to the primary database if it is needed."""
+        routers.reset(pinned=request.method not in ('GET', 'HEAD', 'OPTIONS') or
+                      settings.DB_REPLICA_STICKY_COOKIE in request.COOKIES)
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(routers.track_writes):
+                response = self.get_response(request)
+            if routers.has_written():
+                response.set_cookie(settings.DB_REPLICA_STICKY_COOKIE, '1',
+                                    max_age=settings.DB_REPLICA_STICKY_SECONDS, httponly=True)
+            return response
+        finally:
+            routers.reset()
@@ -0,0 +1,85 @@
+"""Database routers for cloud_assets project."""
+import random
+import re
+import threading
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+WRITE_SQL_RE = re.compile(r'\b(INSERT|UPDATE|DELETE|TRUNCATE)\b', re.IGNORECASE)
+
+
+def pin_primary():
+    """Send all following queries of the thread to the primary database."""
+    _state.pinned = True
+
+
+def is_pinned():
+    """Return True if reads of the thread go to the primary database."""
+    return getattr(_state, 'pinned', False)
+
+
+def has_written():
+    """Return True if the thread wrote to the primary database."""
+    return getattr(_state, 'written', False)
+
+
+def mark_written():
+    """Remember the thread wrote to the primary database and pin it there."""
+    pin_primary()
+    _state.written = True
+
+
+def track_writes(execute, sql, params, many, context):
+    """Execute wrapper marking the thread as written on modifying raw SQL.
+
+    Raw queries do not go through db_for_write, so writes made with
+    connection.cursor() are recognized by their SQL.
+    """
+    if WRITE_SQL_RE.search(sql):
+        mark_written()
+    return execute(sql, params, many, context)
+
+
+def reset(pinned=False):
+    """Reset state of the thread before or after a request."""
+    _state.pinned = pinned
+    _state.written = False
+
+
+def get_read_db():
+    """Return alias of database for reading.
+
+    Reads go to a random replica unless the thread is pinned to the primary
+    by a write or the primary is in a transaction.
+    """
+    if not settings.DATABASE_REPLICAS or is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+    """Route reads to replicas and writes to the primary database.
+
+    After a write the thread reads from the primary too, so the request
+    sees its own changes regardless of replication lag.
+    """
+
+    def db_for_read(self, model, **hints):
+        """Return a replica or the primary database."""
+        return get_read_db()
+
+    def db_for_write(self, model, **hints):
+        """Return the primary database and pin the thread to it."""
+        mark_written()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations between objects of the primary and replicas."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Migrate only the primary database."""
+        return db == DEFAULT_DB_ALIAS
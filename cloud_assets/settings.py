@@ -17,6 +17,20 @@ AWS_SIGNATURE_VERSION = os.getenv('AWS_SIGNATURE_VERSION')
 
 S3_BUCKET = os.getenv('S3_BUCKET')
 
+AWS_S3_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_S3_MAX_POOL_CONNECTIONS', 10))
+AWS_S3_CONNECT_TIMEOUT = int(os.getenv('AWS_S3_CONNECT_TIMEOUT', 60))
+AWS_S3_READ_TIMEOUT = int(os.getenv('AWS_S3_READ_TIMEOUT', 60))
+AWS_S3_MAX_ATTEMPTS = int(os.getenv('AWS_S3_MAX_ATTEMPTS', 3))
+AWS_S3_RETRY_MODE = os.getenv('AWS_S3_RETRY_MODE', 'standard')
+
+AWS_S3_PRESIGNED_URL_EXPIRES_IN = int(os.getenv('AWS_S3_PRESIGNED_URL_EXPIRES_IN', 3600))
+AWS_S3_PRESIGNED_URL_CACHE_FRACTION = float(os.getenv('AWS_S3_PRESIGNED_URL_CACHE_FRACTION', 0.5))
+AWS_S3_PRESIGNED_URL_CACHE_SIZE = int(os.getenv('AWS_S3_PRESIGNED_URL_CACHE_SIZE', 10000))
+
+AWS_S3_UPLOAD_EXPIRES_IN = int(os.getenv('AWS_S3_UPLOAD_EXPIRES_IN', 3600))
+AWS_S3_MAX_UPLOAD_SIZE = int(os.getenv('AWS_S3_MAX_UPLOAD_SIZE', 5 * 1024 ** 3))
+AWS_S3_MAX_MULTIPART_UPLOAD_SIZE = int(os.getenv('AWS_S3_MAX_MULTIPART_UPLOAD_SIZE', 5 * 1024 ** 4))
+
 DEBUG = strtobool(os.getenv('DEBUG'))
 
 ALLOWED_HOSTS = ['*']
@@ -35,6 +49,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cloud_assets.middleware.ProfilerMiddleware',
+    'cloud_assets.middleware.DatabaseHealthCheckMiddleware',
+    'cloud_assets.middleware.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,11 +88,28 @@ DATABASES = {
         'USER': os.getenv("DB_USER"),
         'PASSWORD': os.getenv("DB_PASSWORD"),
         'HOST': os.getenv("DB_HOST"),
-        'PORT': os.getenv("DB_PORT")
-
+        'PORT': os.getenv("DB_PORT"),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': strtobool(os.getenv('DB_CONN_HEALTH_CHECKS', 'True')),
+        'DISABLE_SERVER_SIDE_CURSORS': strtobool(os.getenv('DB_POOLED', 'False')),
     }
 }
 
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    replica_host, _, replica_port = replica.strip().partition(':')
+    DATABASE_REPLICAS.append(f'replica_{index}')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['cloud_assets.routers.ReplicaRouter']
+DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+DB_REPLICA_STICKY_COOKIE = 'use_primary_db'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -111,6 +145,28 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'assets.utils.custom_exception_handler',
 }
 
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 100))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 1000))
+ASSETS_PAGE_SIZE = int(os.getenv('ASSETS_PAGE_SIZE', 100))
+
+# Cached permissions are invalidated only in the cache they were stored in, so
+# SHARED_FILE_CACHE_TIMEOUT must stay 0 unless all processes share the cache.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+SHARED_FILE_CACHE_TIMEOUT = int(os.getenv('SHARED_FILE_CACHE_TIMEOUT', 0))
+USER_STORAGE_QUOTA = int(os.getenv('USER_STORAGE_QUOTA', 10 * 1024 ** 3))
+
+PROFILER_DIR = os.getenv('PROFILER_DIR', os.path.join(BASE_DIR, 'profilers'))
+PROFILER_MAX_FILES = int(os.getenv('PROFILER_MAX_FILES', 100))
+PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', 0))
+PROFILER_SWITCH_FILE = os.getenv('PROFILER_SWITCH_FILE', os.path.join(PROFILER_DIR, 'enabled'))
+PROFILER_SWITCH_CHECK_INTERVAL = int(os.getenv('PROFILER_SWITCH_CHECK_INTERVAL', 5))
+PROFILER_TOKEN = os.getenv('PROFILER_TOKEN')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,